@@ -1,7 +1,9 @@
+import secrets
 from typing import Union
-from fastapi import Depends, WebSocket, WebSocketException
+from fastapi import Depends, Query, WebSocket, WebSocketException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.api.utils.auth import Authentication
+from app.api.utils.paginators import ExactCount, Paginator
 from app.common.handlers import ErrorCode, RequestError
 from app.core.config import settings
 from app.models.accounts.tables import User
@@ -72,3 +74,36 @@ async def get_current_socket_user(
     if token == settings.SOCKET_SECRET:
         return token
     return await get_user(token[7:], websocket)
+
+
+async def verify_metrics_token(
+    token: HTTPAuthorizationCredentials = Depends(jwt_scheme),
+):
+    # Metrics expose the app's internals, so they're only served with the configured token
+    if not settings.METRICS_TOKEN:
+        raise RequestError(
+            err_code=ErrorCode.NON_EXISTENT, err_msg="Not found", status_code=404
+        )
+    if not token or not secrets.compare_digest(
+        token.credentials, settings.METRICS_TOKEN
+    ):
+        raise RequestError(
+            err_code=ErrorCode.UNAUTHORIZED_USER,
+            err_msg="Unauthorized User!",
+            status_code=401,
+        )
+
+
+def get_paginator(
+    default_page_size: int = 50,
+    max_page_size: int = 100,
+    count_strategy: ExactCount = None,
+):
+    # Returns a dependency that creates a paginator for every request.
+    # The client can choose the page size within the endpoint's bounds.
+    def paginator(
+        page_size: int = Query(default_page_size, ge=1, le=max_page_size)
+    ) -> Paginator:
+        return Paginator(page_size, count_strategy)
+
+    return paginator
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, BackgroundTasks, Depends
 from app.api.deps import get_current_user
-from app.api.utils.auth import Authentication
+from app.api.utils.auth import Authentication, user_cache
 from app.common.handlers import ErrorCode
 
 from app.api.schemas.base import ResponseSchema
@@ -16,12 +16,13 @@ from app.api.schemas.auth import (
 )
 
 from app.api.utils.emails import send_email
+from app.api.utils.responses import SchemaResponseRoute
 
 from app.models.accounts.tables import Otp, User
 
 from app.common.handlers import RequestError
 
-router = APIRouter()
+router = APIRouter(route_class=SchemaResponseRoute)
 
 
 @router.post(
@@ -82,7 +83,7 @@ async def verify_email(
         raise RequestError(err_code=ErrorCode.EXPIRED_OTP, err_msg="Expired Otp")
 
     user_by_email.is_email_verified = True
-    await user_by_email.save()
+    await user_by_email.save([User.is_email_verified])
     await otp.remove()
 
     # Send welcome email
@@ -167,6 +168,7 @@ async def set_new_password(
         raise RequestError(err_code=ErrorCode.EXPIRED_OTP, err_msg="Expired Otp")
 
     await User.update_password(user_by_email.id, password)
+    await user_cache.invalidate(user_by_email.id)
     await otp.remove()  # Delete used OTP
 
     # Send password reset success email
@@ -199,11 +201,7 @@ async def login(
         )
 
     # Create tokens and store them
-    user.access_token = await Authentication.create_access_token(
-        {"user_id": str(user.id), "username": user.username}
-    )
-    user.refresh_token = await Authentication.create_refresh_token()
-    await user.save()
+    await Authentication.create_user_tokens(user)
     return {
         "message": "Login successful",
         "data": {"access": user.access_token, "refresh": user.refresh_token},
@@ -226,11 +224,13 @@ async def refresh(data: RefreshTokensSchema) -> TokensResponseSchema:
             status_code=401,
         )
 
-    user.access_token = await Authentication.create_access_token(
-        {"user_id": str(user.id), "username": user.username}
-    )
-    user.refresh_token = await Authentication.create_refresh_token()
-    await user.save()
+    # The refresh token must still be the stored one, so it's only used once
+    if not await Authentication.create_user_tokens(user, User.refresh_token == token):
+        raise RequestError(
+            err_code=ErrorCode.INVALID_TOKEN,
+            err_msg="Refresh token is invalid or expired",
+            status_code=401,
+        )
     return {
         "message": "Tokens refresh successful",
         "data": {"access": user.access_token, "refresh": user.refresh_token},
@@ -243,6 +243,13 @@ async def refresh(data: RefreshTokensSchema) -> TokensResponseSchema:
     description="This endpoint logs a user out from our application",
 )
 async def logout(user: User = Depends(get_current_user)) -> ResponseSchema:
-    user.access_token = user.refresh_token = None
-    await user.save()
+    # The user may come from the cache, so the version is incremented by the db
+    await User.update(
+        {
+            User.access_token: None,
+            User.refresh_token: None,
+            User.token_version: User.token_version + 1,  # Revokes the access token
+        }
+    ).where(User.id == user.id)
+    await user_cache.invalidate(user.id)
     return {"message": "Logout successful"}
@@ -1,11 +1,11 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, Request
-from app.api.deps import get_current_user
+from fastapi import APIRouter, Depends
+from app.api.deps import get_current_user, get_paginator
 from app.api.routes.utils import (
     create_file,
     get_chat_object,
+    get_chat_users,
     get_message_object,
-    is_secured,
     set_chat_latest_messages,
     usernames_to_add_and_remove_validations,
 )
@@ -19,10 +19,14 @@ from app.api.schemas.chat import (
     MessageCreateSchema,
     MessageUpdateSchema,
 )
-from app.api.sockets.chat import send_message_deletion_in_socket
+from app.api.sockets.chat import (
+    send_message_deletion_in_socket,
+    send_message_in_socket,
+)
 
 from app.api.utils.file_processors import ALLOWED_FILE_TYPES
 from app.api.utils.paginators import Paginator
+from app.api.utils.responses import SchemaResponseRoute
 from app.api.utils.utils import set_dict_attr
 from app.common.handlers import ErrorCode
 
@@ -31,10 +35,9 @@ from app.api.schemas.base import ResponseSchema
 from app.models.accounts.tables import User
 
 from app.common.handlers import RequestError
-from app.models.chat.tables import Chat, Message
+from app.models.chat.tables import Chat, ChatMember, Message
 
-router = APIRouter()
-paginator = Paginator()
+router = APIRouter(route_class=SchemaResponseRoute)
 
 
 @router.get(
@@ -46,14 +49,15 @@ paginator = Paginator()
     """,
 )
 async def retrieve_user_chats(
-    page: int = 1, user: User = Depends(get_current_user)
+    page: int = 1,
+    user: User = Depends(get_current_user),
+    paginator: Paginator = Depends(get_paginator(200, max_page_size=200)),
 ) -> ChatsResponseSchema:
     chats = (
         Chat.objects(Chat.owner, Chat.owner.avatar, Chat.image)
-        .where((Chat.owner == user.id) | (Chat.user_ids.any(user.id)))
+        .where(Chat.member_filter(user.id))
         .order_by(Chat.updated_at, ascending=False)
     )
-    paginator.page_size = 200
     paginated_data = await paginator.paginate_queryset(chats, page)
     # To attach latest messages
     items = paginated_data["items"]
@@ -95,11 +99,7 @@ async def send_message(
 
         chat = (
             await Chat.objects()
-            .where(
-                Chat.ctype == "DM",
-                ((Chat.owner == user.id) & (Chat.user_ids.any(recipient_user.id)))
-                | ((Chat.owner == recipient_user.id) & (Chat.user_ids.any(user.id))),
-            )
+            .where(*Chat.dm_filters(user.id, recipient_user.id))
             .first()
         )
 
@@ -111,12 +111,12 @@ async def send_message(
                 status_code=422,
                 data={"username": "A chat already exist between you and the recipient"},
             )
-        chat = await Chat.objects().create(owner=user.id, user_ids=[recipient_user.id])
+        chat = await Chat.create_with_members(user, [recipient_user.id])
     else:
         # Get the chat with chat id and check if the current user is the owner or the recipient
         chat = (
             await Chat.objects()
-            .where((Chat.owner == user.id) | (Chat.user_ids.any(user.id)))
+            .where(Chat.member_filter(user.id))
             .get(Chat.id == chat_id)
         )
         if not chat:
@@ -134,6 +134,9 @@ async def send_message(
     )
     message.sender = user
     message.file_upload_id = file_upload_id
+
+    # Send socket message
+    send_message_in_socket(message, "CREATED", username)
     return {"message": "Message sent", "data": message}
 
 
@@ -142,17 +145,22 @@ async def send_message(
     summary="Retrieve messages from a Chat",
     description="""
         This endpoint retrieves all messages in a chat.
+        For infinite scrolling, pass the next_cursor or prev_cursor of a response as the cursor query param (page is then ignored)
     """,
 )
 async def retrieve_messages(
-    chat_id: UUID, page: int = 1, user: User = Depends(get_current_user)
+    chat_id: UUID,
+    page: int = 1,
+    cursor: str = None,
+    user: User = Depends(get_current_user),
+    paginator: Paginator = Depends(get_paginator(400, max_page_size=400)),
 ) -> ChatResponseSchema:
     chat = await get_chat_object(user, chat_id)
-    paginator.page_size = 400
-    paginated_data = await paginator.paginate_queryset(chat.messages, page)
-    # Set latest message obj
-    messages = paginated_data["items"]
-    chat._latest_message_obj = messages[0] if len(messages) > 0 else None
+    paginated_data = await paginator.paginate_queryset(
+        chat.messages, page, cursor, order_by=Message.created_at, ascending=False
+    )
+    # Set latest message obj (the first of the page is only the latest on the newest page)
+    await set_chat_latest_messages([chat])
 
     data = {"chat": chat, "messages": paginated_data, "users": chat.users}
     return {"message": "Messages fetched", "data": data}
@@ -185,25 +193,30 @@ async def update_group_chat(
     # Handle Users Upload or Remove
     usernames_to_add = data.pop("usernames_to_add", None)
     usernames_to_remove = data.pop("usernames_to_remove", None)
-    chat = await usernames_to_add_and_remove_validations(
+    user_ids_to_add, user_ids_to_remove = await usernames_to_add_and_remove_validations(
         chat, usernames_to_add, usernames_to_remove
     )
 
-    # Handle File Upload
-    file_type = data.pop("file_type", None)
-    image_upload_id = False
-    if file_type:
-        file = chat.image
-        if file.id:
-            file.resource_type = file_type
-            await file.save()
-        else:
-            file = await create_file(file_type)
-            data["image"] = file.id
-        image_upload_id = file.id
-    chat = set_dict_attr(data, chat)
-    await chat.save()
-    chat.users = await User.objects(User.avatar).where(User.id.is_in(chat.user_ids))
+    # The members, the image and the chat are updated together
+    async with Chat._meta.db.transaction():
+        await ChatMember.add(chat.id, user_ids_to_add)
+        await ChatMember.remove_users(chat.id, user_ids_to_remove)
+
+        # Handle File Upload
+        file_type = data.pop("file_type", None)
+        image_upload_id = False
+        if file_type:
+            file = chat.image
+            if file.id:
+                file.resource_type = file_type
+                await file.save()
+            else:
+                file = await create_file(file_type)
+                data["image"] = file.id
+            image_upload_id = file.id
+        chat = set_dict_attr(data, chat)
+        await chat.save()
+    chat.users = await get_chat_users(chat)
     chat.image_upload_id = image_upload_id
     return {"message": "Chat updated", "data": chat}
 
@@ -265,6 +278,9 @@ async def update_message(
     await message.save()
     message.file_upload_id = file_upload_id
     message.chat = message.chat.id
+
+    # Send socket message
+    send_message_in_socket(message, "UPDATED")
     return {"message": "Message updated", "data": message}
 
 
@@ -277,7 +293,7 @@ async def update_message(
     """,
 )
 async def delete_message(
-    request: Request, message_id: UUID, user: User = Depends(get_current_user)
+    message_id: UUID, user: User = Depends(get_current_user)
 ) -> ResponseSchema:
     message = await get_message_object(message_id, user)
     chat = message.chat
@@ -285,9 +301,7 @@ async def delete_message(
     messages_count = await Message.count().where(Message.chat == chat_id)
 
     # Send socket message
-    await send_message_deletion_in_socket(
-        is_secured(request), request.headers["host"], chat_id, message_id
-    )
+    send_message_deletion_in_socket(chat_id, message_id)
 
     # Delete message and chat if its the last message in the dm being deleted
     if messages_count == 1 and chat.ctype == "DM":
@@ -321,7 +335,7 @@ async def create_group_chat(
     data: GroupChatCreateSchema, user: User = Depends(get_current_user)
 ) -> GroupChatInputResponseSchema:
     data = data.model_dump(exclude_none=True)
-    data.update({"owner": user, "ctype": "GROUP"})
+    data["ctype"] = "GROUP"
 
     # Handle Users Upload
     usernames_to_add = data.pop("usernames_to_add")
@@ -345,8 +359,8 @@ async def create_group_chat(
         image_upload_id = file.id
 
     # Create Chat
-    data["user_ids"] = [user.id for user in users_to_add]
-    chat = await Chat.objects().create(**data)
+    user_ids = [user.id for user in users_to_add]
+    chat = await Chat.create_with_members(user, user_ids, **data)
     chat.users = users_to_add
     chat.image_upload_id = image_upload_id
     return {"message": "Chat created", "data": chat}
@@ -1,13 +1,12 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, Path, Request
-from app.api.deps import get_current_user
+from fastapi import APIRouter, Depends, Path
+from app.api.deps import get_current_user, get_paginator
 from app.api.routes.utils import (
     get_comment_object,
     get_post_object,
     get_reaction_focus_object,
     get_reactions_queryset,
     get_reply_object,
-    is_secured,
 )
 from app.api.schemas.feed import (
     CommentInputSchema,
@@ -25,7 +24,8 @@ from app.api.schemas.feed import (
 )
 from app.api.utils.file_processors import ALLOWED_IMAGE_TYPES
 from app.api.utils.notification import send_notification_in_socket
-from app.api.utils.paginators import Paginator
+from app.api.utils.paginators import CachedCount, EstimatedCount, Paginator
+from app.api.utils.responses import SchemaResponseRoute
 from app.api.utils.utils import set_dict_attr
 from app.common.handlers import ErrorCode
 
@@ -36,24 +36,34 @@ from app.models.accounts.tables import User
 from app.common.handlers import RequestError
 from app.models.base.tables import File
 from app.models.feed.tables import Comment, Post, Reaction, Reply
-from app.models.profiles.tables import Notification
+from app.models.profiles.tables import Notification, NotificationRecipient
 
-router = APIRouter()
-paginator = Paginator()
+router = APIRouter(route_class=SchemaResponseRoute)
 
 
 @router.get(
     "/posts",
     summary="Retrieve Latest Posts",
-    description="This endpoint retrieves a paginated response of latest posts",
+    description="""
+        This endpoint retrieves a paginated response of latest posts
+        For infinite scrolling, pass the next_cursor or prev_cursor of a response as the cursor query param (page is then ignored)
+    """,
 )
-async def retrieve_posts(page: int = 1) -> PostsResponseSchema:
+async def retrieve_posts(
+    page: int = 1,
+    cursor: str = None,
+    paginator: Paginator = Depends(
+        get_paginator(count_strategy=CachedCount(EstimatedCount()))
+    ),
+) -> PostsResponseSchema:
     posts = Post.objects(
         Post.author,
         Post.author.avatar,
         Post.image,
-    ).order_by("created_at", ascending=False)
-    paginated_data = await paginator.paginate_queryset(posts, page)
+    )
+    paginated_data = await paginator.paginate_queryset(
+        posts, page, cursor, order_by=Post.created_at, ascending=False
+    )
     return {"message": "Posts fetched", "data": paginated_data}
 
 
@@ -165,6 +175,7 @@ async def retrieve_reactions(
     slug: str = slug_query,
     reaction_type: str = None,
     page: int = 1,
+    paginator: Paginator = Depends(get_paginator()),
 ) -> ReactionsResponseSchema:
     reactions = await get_reactions_queryset(focus, slug, reaction_type)
     paginated_data = await paginator.paginate_queryset(reactions, page)
@@ -185,7 +196,6 @@ async def retrieve_reactions(
     status_code=201,
 )
 async def create_reaction(
-    request: Request,
     data: ReactionInputSchema,
     focus: str = focus_query,
     slug: str = slug_query,
@@ -214,36 +224,20 @@ async def create_reaction(
     if (
         obj.author.id != user.id
     ):  # Send notification only when it's not the user reacting to his data
-        notification = (
-            await Notification.objects(
-                Notification.sender,
-                Notification.sender.avatar,
-                Notification.post,
-                Notification.comment,
-                Notification.comment.post,
-                Notification.reply,
-                Notification.reply.comment,
-                Notification.reply.comment.post,
-            )
-            .where(Notification.ntype == "REACTION", Notification.sender == user.id)
-            .get_or_create(
-                getattr(Notification, obj_field) == obj.id,
-                defaults={
-                    Notification.ntype: "REACTION",
-                    Notification.sender: user.id,
-                    Notification.receiver_ids: [obj.author.id],
-                },
-            )
+        notification_exists = await Notification.exists().where(
+            Notification.ntype == "REACTION",
+            Notification.sender == user.id,
+            getattr(Notification, obj_field) == obj.id,
         )
-
-        if notification._was_created:
+        if not notification_exists:
+            receiver_ids = [obj.author.id]
+            notification = await Notification.create_with_recipients(
+                receiver_ids, sender=user.id, ntype="REACTION", **{obj_field: obj.id}
+            )
             notification.sender = user
+            setattr(notification, obj_field, obj)
             # Send to websocket
-            await send_notification_in_socket(
-                is_secured(request),
-                request.headers["host"],
-                notification,
-            )
+            send_notification_in_socket(notification, receiver_ids)
 
     return {"message": "Reaction created", "data": reaction}
 
@@ -256,7 +250,7 @@ async def create_reaction(
     """,
 )
 async def remove_reaction(
-    request: Request, id: UUID, user: User = Depends(get_current_user)
+    id: UUID, user: User = Depends(get_current_user)
 ) -> ResponseSchema:
     reaction = await Reaction.objects(
         Reaction.post, Reaction.comment, Reaction.reply
@@ -289,9 +283,8 @@ async def remove_reaction(
     )
     if notification:
         # Send to websocket and delete notification
-        await send_notification_in_socket(
-            is_secured(request), request.headers["host"], notification, status="DELETED"
-        )
+        receiver_ids = await NotificationRecipient.get_user_ids(notification.id)
+        send_notification_in_socket(notification, receiver_ids, status="DELETED")
         await notification.remove()
 
     await reaction.remove()
@@ -306,14 +299,22 @@ async def remove_reaction(
     summary="Retrieve Post Comments",
     description="""
         This endpoint retrieves comments of a particular post.
+        For infinite scrolling, pass the next_cursor or prev_cursor of a response as the cursor query param (page is then ignored)
     """,
 )
-async def retrieve_comments(slug: str, page: int = 1) -> CommentsResponseSchema:
+async def retrieve_comments(
+    slug: str,
+    page: int = 1,
+    cursor: str = None,
+    paginator: Paginator = Depends(get_paginator()),
+) -> CommentsResponseSchema:
     post = await get_post_object(slug)
     comments = Comment.objects(Comment.author, Comment.author.avatar).where(
         Comment.post == post.id
     )
-    paginated_data = await paginator.paginate_queryset(comments, page)
+    paginated_data = await paginator.paginate_queryset(
+        comments, page, cursor, order_by=Comment.created_at
+    )
     return {"message": "Comments Fetched", "data": paginated_data}
 
 
@@ -326,7 +327,6 @@ async def retrieve_comments(slug: str, page: int = 1) -> CommentsResponseSchema:
     status_code=201,
 )
 async def create_comment(
-    request: Request,
     slug: str,
     data: CommentInputSchema,
     user: User = Depends(get_current_user),
@@ -336,18 +336,14 @@ async def create_comment(
 
     # Create and Send Notification
     if user.id != post.author:
-        notification = await Notification.objects().create(
-            sender=user.id,
-            ntype="COMMENT",
-            comment=comment.id,
-            receiver_ids=[post.author],
+        receiver_ids = [post.author]
+        notification = await Notification.create_with_recipients(
+            receiver_ids, sender=user.id, ntype="COMMENT", comment=comment.id
         )
         notification.sender = user
         notification.comment = comment
         # Send to websocket
-        await send_notification_in_socket(
-            is_secured(request), request.headers["host"], notification
-        )
+        send_notification_in_socket(notification, receiver_ids)
     return {"message": "Comment Created", "data": comment}
 
 
@@ -356,16 +352,22 @@ async def create_comment(
     summary="Retrieve Comment with replies",
     description="""
         This endpoint retrieves a comment with replies.
+        For infinite scrolling, pass the next_cursor or prev_cursor of a response as the cursor query param (page is then ignored)
     """,
 )
 async def retrieve_comment_with_replies(
-    slug: str, page: int = 1
+    slug: str,
+    page: int = 1,
+    cursor: str = None,
+    paginator: Paginator = Depends(get_paginator()),
 ) -> CommentWithRepliesResponseSchema:
     comment = await get_comment_object(slug)
     replies = Reply.objects(Reply.author, Reply.author.avatar).where(
         Reply.comment == comment.id
     )
-    paginated_data = await paginator.paginate_queryset(replies, page)
+    paginated_data = await paginator.paginate_queryset(
+        replies, page, cursor, order_by=Reply.created_at
+    )
     data = {"comment": comment, "replies": paginated_data}
     return {"message": "Comment and Replies Fetched", "data": data}
 
@@ -379,7 +381,6 @@ async def retrieve_comment_with_replies(
     status_code=201,
 )
 async def create_reply(
-    request: Request,
     slug: str,
     data: CommentInputSchema,
     user: User = Depends(get_current_user),
@@ -389,18 +390,14 @@ async def create_reply(
 
     # Create and Send Notification
     if user.id != comment.author.id:
-        notification = await Notification.objects().create(
-            sender=user.id,
-            ntype="REPLY",
-            reply=reply.id,
-            receiver_ids=[comment.author.id],
+        receiver_ids = [comment.author.id]
+        notification = await Notification.create_with_recipients(
+            receiver_ids, sender=user.id, ntype="REPLY", reply=reply.id
         )
         notification.sender = user
         notification.reply = reply
         # Send to websocket
-        await send_notification_in_socket(
-            is_secured(request), request.headers["host"], notification
-        )
+        send_notification_in_socket(notification, receiver_ids)
     return {"message": "Reply Created", "data": reply}
 
 
@@ -434,7 +431,7 @@ async def update_comment(
     """,
 )
 async def delete_comment(
-    request: Request, slug: str, user: User = Depends(get_current_user)
+    slug: str, user: User = Depends(get_current_user)
 ) -> ResponseSchema:
     comment = await get_comment_object(slug)
     if user.id != comment.author.id:
@@ -456,9 +453,8 @@ async def delete_comment(
     )
     if notification:
         # Send to websocket and delete notification
-        await send_notification_in_socket(
-            is_secured(request), request.headers["host"], notification, status="DELETED"
-        )
+        receiver_ids = await NotificationRecipient.get_user_ids(notification.id)
+        send_notification_in_socket(notification, receiver_ids, status="DELETED")
 
     await comment.remove()  # deletes notification alongside (CASCADE)
     return {"message": "Comment Deleted"}
@@ -506,7 +502,7 @@ async def update_reply(
     """,
 )
 async def delete_reply(
-    request: Request, slug: str, user: User = Depends(get_current_user)
+    slug: str, user: User = Depends(get_current_user)
 ) -> ResponseSchema:
     reply = await get_reply_object(slug)
     if user.id != reply.author.id:
@@ -528,9 +524,8 @@ async def delete_reply(
     )
     if notification:
         # Send to websocket and delete notification
-        await send_notification_in_socket(
-            is_secured(request), request.headers["host"], notification, status="DELETED"
-        )
+        receiver_ids = await NotificationRecipient.get_user_ids(notification.id)
+        send_notification_in_socket(notification, receiver_ids, status="DELETED")
 
     await reply.remove()  # deletes notification alongside (CASCADE)
     return {"message": "Reply Deleted"}
@@ -2,9 +2,10 @@ from fastapi import APIRouter
 from app.api.schemas.general import (
     SiteDetailResponseSchema,
 )
+from app.api.utils.responses import SchemaResponseRoute
 from app.models.general.tables import SiteDetail
 
-router = APIRouter()
+router = APIRouter(route_class=SchemaResponseRoute)
 
 
 @router.get(
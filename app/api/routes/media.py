@@ -0,0 +1,77 @@
+import mimetypes
+import os
+from fastapi import APIRouter, Depends, Request
+from starlette.concurrency import run_in_threadpool
+from app.api.schemas.base import ResponseSchema
+from app.api.utils.responses import SchemaResponseRoute, SendfileResponse
+from app.api.utils.storage import LocalStorage, storage
+from app.common.handlers import ErrorCode, RequestError
+
+# Upload and download of files kept by the local storage backend
+router = APIRouter(route_class=SchemaResponseRoute)
+
+
+def get_local_storage() -> LocalStorage:
+    if not isinstance(storage, LocalStorage):
+        raise RequestError(
+            err_code=ErrorCode.NON_EXISTENT,
+            err_msg="Files aren't stored locally",
+            status_code=404,
+        )
+    return storage
+
+
+@router.put(
+    "/{public_id:path}",
+    summary="Upload a file",
+    description="""
+        This endpoint uploads the request body as the file of the public_id, using the signature and timestamp of the file_upload_data.
+    """,
+)
+async def upload_file(
+    public_id: str,
+    signature: str,
+    timestamp: str,
+    request: Request,
+    storage: LocalStorage = Depends(get_local_storage),
+) -> ResponseSchema:
+    if not storage.verify_signature(public_id, timestamp, signature):
+        raise RequestError(
+            err_code=ErrorCode.INVALID_TOKEN,
+            err_msg="Invalid or expired signature",
+            status_code=401,
+        )
+    # Streamed to disk as it's received
+    temporary_file = await run_in_threadpool(storage.open_temporary_file, public_id)
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(temporary_file.write, chunk)
+        await run_in_threadpool(storage.save_temporary_file, public_id, temporary_file)
+    except Exception:
+        temporary_file.close()
+        os.unlink(temporary_file.name)
+        raise
+    return {"message": "File uploaded"}
+
+
+@router.get(
+    "/{path:path}",
+    summary="Retrieve a file",
+    description="This endpoint serves the file of a generated file url",
+)
+async def retrieve_file(
+    path: str, storage: LocalStorage = Depends(get_local_storage)
+) -> SendfileResponse:
+    # Urls are the public id with the extension of the file's content type
+    public_id = os.path.splitext(path)[0]
+    try:
+        file_path = storage.get_path(public_id)
+    except ValueError:
+        file_path = None
+    if not file_path or not file_path.is_file():
+        raise RequestError(
+            err_code=ErrorCode.NON_EXISTENT,
+            err_msg="File does not exist",
+            status_code=404,
+        )
+    return SendfileResponse(file_path, media_type=mimetypes.guess_type(path)[0])
@@ -1,7 +1,7 @@
 import re
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
-from app.api.deps import get_current_user, get_current_user_or_guest
+from app.api.deps import get_current_user, get_current_user_or_guest, get_paginator
 from app.api.routes.utils import (
     get_notifications_queryset,
     get_requestee_and_friend_obj,
@@ -18,21 +18,26 @@ from app.api.schemas.profiles import (
     ProfilesResponseSchema,
     ReadNotificationSchema,
     SendFriendRequestSchema,
+    UnreadNotificationsCountResponseSchema,
 )
+from app.api.utils.auth import user_cache
 from app.api.utils.file_processors import ALLOWED_IMAGE_TYPES
-from app.api.utils.paginators import Paginator
+from app.api.utils.paginators import CachedCount, EstimatedCount, Paginator
+from app.api.utils.responses import SchemaResponseRoute
 from app.api.utils.utils import set_dict_attr
 from app.common.handlers import ErrorCode, RequestError
 from app.models.accounts.tables import City, User
 from app.models.base.tables import File
-from app.models.profiles.tables import Friend, Notification
+from app.models.profiles.tables import Friend, NotificationRecipient
 
-router = APIRouter()
-paginator = Paginator()
+router = APIRouter(route_class=SchemaResponseRoute)
 
 
 def get_users_queryset(current_user):
-    users = User.objects(User.avatar, User.city)
+    # Newest first, a stable order for the pages (served by the (created_at, id) index)
+    users = User.objects(User.avatar, User.city).order_by(
+        User.created_at, User.id, ascending=False
+    )
     if current_user:
         users = users.where(User.id != current_user.id)
         # Right here I wanted to do some ordering by city and regions but that will not be a possibility
@@ -46,7 +51,11 @@ def get_users_queryset(current_user):
     description="This endpoint retrieves a paginated list of users",
 )
 async def retrieve_users(
-    page: int = 1, user: User = Depends(get_current_user_or_guest)
+    page: int = 1,
+    user: User = Depends(get_current_user_or_guest),
+    paginator: Paginator = Depends(
+        get_paginator(count_strategy=CachedCount(EstimatedCount()))
+    ),
 ) -> ProfilesResponseSchema:
     users = get_users_queryset(user)
     paginated_data = await paginator.paginate_queryset(users, page)
@@ -127,7 +136,7 @@ async def update_profile(
         avatar = user.avatar
         if avatar.id:
             avatar.resource_type = file_type
-            await avatar.save()
+            await avatar.save([File.resource_type])
         else:
             avatar = await File.objects().create(resource_type=file_type)
         image_upload_id = avatar.id
@@ -136,7 +145,9 @@ async def update_profile(
     # Set attributes from data to user object
     user = set_dict_attr(data, user)
     user.image_upload_id = image_upload_id
-    await user.save()
+    # Only the updated columns, the rest of a (cached) user may be stale
+    await user.save(list(data))
+    await user_cache.invalidate(user.id)
     user.city = city  # Set city to object instead of ID for response sake
     return {"message": "User updated", "data": user}
 
@@ -150,7 +161,7 @@ async def delete_user(
     data: DeleteUserSchema, user: User = Depends(get_current_user)
 ) -> ResponseSchema:
     # Check if password is valid
-    if not User.check_password(data.password, user.password):
+    if not await User.verify_password_async(data.password, user.password):
         raise RequestError(
             err_code=ErrorCode.INVALID_CREDENTIALS,
             err_msg="Invalid Entry",
@@ -160,6 +171,7 @@ async def delete_user(
 
     # Delete user
     await user.remove()
+    await user_cache.invalidate(user.id)
     return {"message": "User deleted"}
 
 
@@ -172,7 +184,9 @@ async def delete_user(
     description="This endpoint retrieves friends of a user",
 )
 async def retrieve_friends(
-    page: int = 1, user: User = Depends(get_current_user)
+    page: int = 1,
+    user: User = Depends(get_current_user),
+    paginator: Paginator = Depends(get_paginator(20, max_page_size=50)),
 ) -> ProfilesResponseSchema:
     friends = await Friend.select(Friend.requester, Friend.requestee).where(
         Friend.status == "ACCEPTED",
@@ -187,7 +201,6 @@ async def retrieve_friends(
         friends = User.objects(User.avatar, User.city).where(User.id.is_in(friend_ids))
 
     # Return paginated data
-    paginator.page_size = 20
     paginated_data = await paginator.paginate_queryset(friends, page)
     return {"message": "Friends fetched", "data": paginated_data}
 
@@ -198,7 +211,9 @@ async def retrieve_friends(
     description="This endpoint retrieves friend requests of a user",
 )
 async def retrieve_friend_requests(
-    page: int = 1, user: User = Depends(get_current_user)
+    page: int = 1,
+    user: User = Depends(get_current_user),
+    paginator: Paginator = Depends(get_paginator(20, max_page_size=50)),
 ) -> ProfilesResponseSchema:
     pending_friends = await Friend.select(Friend.requester).where(
         Friend.requestee == user.id, Friend.status == "PENDING"
@@ -211,7 +226,6 @@ async def retrieve_friend_requests(
         )
 
     # Return paginated data
-    paginator.page_size = 20
     paginated_data = await paginator.paginate_queryset(friends, page)
     return {"message": "Friend Requests fetched", "data": paginated_data}
 
@@ -300,18 +314,37 @@ async def accept_or_reject_friend_request(
     """,
 )
 async def retrieve_user_notifications(
-    page: int = 1, user: User = Depends(get_current_user)
+    page: int = 1,
+    user: User = Depends(get_current_user),
+    paginator: Paginator = Depends(get_paginator()),
 ) -> NotificationsResponseSchema:
     notifications = get_notifications_queryset(user)
 
-    # Return paginated data and set is_read to every item
+    # Return paginated data and set is_read to every item (in one query for the page)
     paginated_data = await paginator.paginate_queryset(notifications, page)
     items = paginated_data["items"]
+    read_ids = await NotificationRecipient.get_read_notification_ids(
+        user.id, [item.id for item in items]
+    )
     for item in items:
-        item.is_read = True if user.id in item.read_by_ids else False
+        item.is_read = item.id in read_ids
     return {"message": "Notifications fetched", "data": paginated_data}
 
 
+@router.get(
+    "/notifications/unread-count",
+    summary="Retrieve Auth User Unread Notifications Count",
+    description="""
+        This endpoint retrieves the number of auth user's unread notifications
+    """,
+)
+async def retrieve_user_unread_notifications_count(
+    user: User = Depends(get_current_user),
+) -> UnreadNotificationsCountResponseSchema:
+    count = await NotificationRecipient.count_unread(user.id)
+    return {"message": "Unread notifications count fetched", "data": {"count": count}}
+
+
 @router.post(
     "/notifications",
     summary="Read Notification",
@@ -327,34 +360,20 @@ async def read_notification(
 
     resp_message = "Notifications read"
     if mark_all_as_read:
-        notifications = await Notification.select(
-            Notification.id, Notification.read_by_ids
-        ).where(Notification.receiver_ids.any(user.id))
-        notification_ids_to_update = [
-            notification["id"]
-            for notification in notifications
-            if not user.id in notification["read_by_ids"]
-        ]
         # Mark all notifications as read
-        if len(notification_ids_to_update) > 0:
-            await Notification.update(
-                {Notification.read_by_ids: Notification.read_by_ids + user.id}
-            ).where(Notification.id.is_in(notification_ids_to_update))
+        await NotificationRecipient.mark_as_read(user.id)
     elif id:
         # Mark single notification as read
-        notification = (
-            await Notification.objects()
-            .where(Notification.receiver_ids.any(user.id), Notification.id == id)
-            .first()
+        received = await NotificationRecipient.exists().where(
+            NotificationRecipient.user == user.id,
+            NotificationRecipient.notification == id,
         )
-        if not notification:
+        if not received:
             raise RequestError(
                 err_code=ErrorCode.NON_EXISTENT,
                 err_msg="User has no notification with that ID",
                 status_code=404,
             )
-        if not user.id in notification.read_by_ids:
-            notification.read_by_ids.append(user.id)
-            await notification.save()
+        await NotificationRecipient.mark_as_read(user.id, id)
         resp_message = "Notification read"
     return {"message": resp_message}
@@ -1,10 +1,9 @@
 from typing import Literal
 
-from fastapi import Request
 from app.common.handlers import ErrorCode, RequestError
 from app.models.accounts.tables import User
 from app.models.base.tables import File
-from app.models.chat.tables import Chat, Message
+from app.models.chat.tables import Chat, ChatMember, Message
 
 from app.models.feed.tables import Comment, Post, Reply, Reaction
 from app.models.profiles.tables import Friend, Notification
@@ -97,10 +96,6 @@ async def get_reply_object(slug):
     return reply
 
 
-def is_secured(request: Request) -> bool:
-    return request.scope["scheme"].endswith("s")  # if request is secured
-
-
 async def get_requestee_and_friend_obj(user, username, status=None):
     # Get and validate username existence
     requestee = await User.objects().get(User.username == username)
@@ -132,14 +127,16 @@ def get_notifications_queryset(current_user):
             Notification.comment,
             Notification.reply,
         )
-        .where(Notification.receiver_ids.any(current_user_id))
+        .where(Notification.recipient_filter(current_user_id))
         .order_by(Notification.created_at, ascending=False)
     )
     return notifications
 
 
 async def set_chat_latest_messages(chats):
-    latest_message_ids = [chat.latest_message_id for chat in chats]
+    latest_message_ids = [
+        chat.latest_message_id for chat in chats if chat.latest_message_id
+    ]
     if latest_message_ids:
         latest_messages = await Message.objects(
             Message.sender, Message.sender.avatar, Message.file
@@ -147,8 +144,10 @@ async def set_chat_latest_messages(chats):
         latest_messages_dict = {
             latest_message.chat: latest_message for latest_message in latest_messages
         }
-        for chat in chats:
-            chat._latest_message_obj = latest_messages_dict.get(chat.id)
+    else:
+        latest_messages_dict = {}
+    for chat in chats:
+        chat._latest_message_obj = latest_messages_dict.get(chat.id)
     return chats
 
 
@@ -163,7 +162,7 @@ async def create_file(file_type=None):
 async def get_chat_object(user, chat_id):
     chat = (
         await Chat.objects(Chat.owner, Chat.owner.avatar, Chat.image)
-        .where((Chat.owner == user.id) | (Chat.user_ids.any(user.id)))
+        .where(Chat.member_filter(user.id))
         .get(Chat.id == chat_id)
     )
     if not chat:
@@ -172,53 +171,65 @@ async def get_chat_object(user, chat_id):
             err_msg="User has no chat with that ID",
             status_code=404,
         )
-    messages = (
-        Message.objects(Message.sender, Message.sender.avatar, Message.file)
-        .where(Message.chat == chat_id)
-        .order_by(Message.created_at, ascending=False)
-    )
-    users = await User.objects(User.avatar).where(User.id.is_in(chat.user_ids))
+    messages = Message.objects(
+        Message.sender, Message.sender.avatar, Message.file
+    ).where(Message.chat == chat_id)
     chat.messages = messages
-    chat.users = users
+    chat.users = await get_chat_users(chat)
     return chat
 
 
+async def get_chat_users(chat: Chat):
+    # The members other than the owner (a DM with oneself lists the owner)
+    owner_id = getattr(chat.owner, "id", chat.owner)
+    members = await ChatMember.objects(ChatMember.user, ChatMember.user.avatar).where(
+        ChatMember.chat == chat.id
+    )
+    users = [member.user for member in members]
+    other_users = [user for user in users if user.id != owner_id]
+    if not other_users and chat.ctype == "DM":
+        return users
+    return other_users
+
+
 async def usernames_to_add_and_remove_validations(
     chat: Chat, usernames_to_add=None, usernames_to_remove=None
 ):
-    original_user_ids = chat.user_ids
+    # Returns the ids of the users to add and remove, the caller writes them to chat_member
+    members = await ChatMember.select(ChatMember.user).where(ChatMember.chat == chat.id)
+    member_ids = {member["user"] for member in members}  # The owner included
+    user_ids_to_add, user_ids_to_remove = [], []
     if usernames_to_add:
-        users_to_add = (
-            await User.select(User.id)
-            .where(User.username.is_in(usernames_to_add))
-            .where((User.id.not_in(original_user_ids)) | (User.id != chat.owner))
+        users_to_add = await User.select(User.id).where(
+            User.username.is_in(usernames_to_add)
         )
-        user_ids_to_add = [user["id"] for user in users_to_add]
-        chat.user_ids += user_ids_to_add
+        user_ids_to_add = [
+            user["id"] for user in users_to_add if user["id"] not in member_ids
+        ]
     if usernames_to_remove:
-        if not original_user_ids:
+        if len(member_ids) < 2:
             raise RequestError(
                 err_code=ErrorCode.INVALID_ENTRY,
                 err_msg="Invalid Entry",
                 status_code=422,
                 data={"usernames_to_remove": "No users to remove"},
             )
-        users_to_remove = (
-            await User.select(User.id)
-            .where(User.username.is_in(usernames_to_remove))
-            .where((User.id != chat.owner) & (User.id.is_in(original_user_ids)))
+        users_to_remove = await User.select(User.id).where(
+            User.username.is_in(usernames_to_remove), User.id != chat.owner
         )
-        user_ids_to_remove = [user["id"] for user in users_to_remove]
-        chat.user_ids = set(chat.user_ids) - set(user_ids_to_remove)
+        user_ids_to_remove = [
+            user["id"] for user in users_to_remove if user["id"] in member_ids
+        ]
 
-    if len(chat.user_ids) > 99:
+    users_count = len(member_ids) - 1 + len(user_ids_to_add) - len(user_ids_to_remove)
+    if users_count > 99:
         raise RequestError(
             err_code=ErrorCode.INVALID_ENTRY,
             err_msg="Invalid Entry",
             status_code=422,
             data={"usernames_to_add": "99 users limit reached"},
         )
-    return chat
+    return user_ids_to_add, user_ids_to_remove
 
 
 async def get_message_object(message_id, user):
@@ -27,6 +27,14 @@ class PaginatedResponseDataSchema(BaseModel):
     per_page: int
     current_page: int
     last_page: int
+    last_page_estimated: bool = False
+
+
+class CursorPaginatedResponseDataSchema(PaginatedResponseDataSchema):
+    current_page: Optional[int]  # Not set when paginating by cursor
+    last_page: Optional[int]  # Not set when paginating by cursor
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 class UserDataSchema(BaseModel):
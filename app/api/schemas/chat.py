@@ -2,6 +2,7 @@ from typing import Any, Dict, List, Optional
 from pydantic import Field, validator
 from app.api.schemas.base import (
     BaseModel,
+    CursorPaginatedResponseDataSchema,
     PaginatedResponseDataSchema,
     ResponseSchema,
     UserDataSchema,
@@ -65,7 +66,7 @@ class MessageCreateSchema(MessageUpdateSchema):
         return v
 
 
-class MessagesResponseDataSchema(PaginatedResponseDataSchema):
+class MessagesResponseDataSchema(CursorPaginatedResponseDataSchema):
     items: List[MessageSchema]
 
 
@@ -5,6 +5,7 @@ from .base import (
     ResponseSchema,
     UserDataSchema,
     PaginatedResponseDataSchema,
+    CursorPaginatedResponseDataSchema,
 )
 from app.api.utils.file_processors import FileProcessor
 from app.api.utils.utils import validate_image_type
@@ -37,7 +38,7 @@ class PostInputSchema(BaseModel):
         return validate_image_type(v)
 
 
-class PostsResponseDataSchema(PaginatedResponseDataSchema):
+class PostsResponseDataSchema(CursorPaginatedResponseDataSchema):
     items: List[PostSchema] = Field(..., serialization_alias="posts")
 
 
@@ -106,7 +107,7 @@ class CommentSchema(ReplySchema):
     replies_count: int = 0
 
 
-class CommentWithRepliesResponseDataSchema(PaginatedResponseDataSchema):
+class CommentWithRepliesResponseDataSchema(CursorPaginatedResponseDataSchema):
     items: List[ReplySchema]
 
 
@@ -119,7 +120,7 @@ class CommentInputSchema(BaseModel):
     text: str
 
 
-class CommentsResponseDataSchema(PaginatedResponseDataSchema):
+class CommentsResponseDataSchema(CursorPaginatedResponseDataSchema):
     items: List[CommentSchema] = Field(..., serialization_alias="comments")
 
 
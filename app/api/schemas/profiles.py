@@ -138,3 +138,11 @@ class NotificationsResponseDataSchema(PaginatedResponseDataSchema):
 
 class NotificationsResponseSchema(ResponseSchema):
     data: NotificationsResponseDataSchema
+
+
+class UnreadNotificationsCountDataSchema(BaseModel):
+    count: int = Field(..., example=3)
+
+
+class UnreadNotificationsCountResponseSchema(ResponseSchema):
+    data: UnreadNotificationsCountDataSchema
@@ -1,15 +1,128 @@
+import asyncio
 import json
+import logging
+import orjson
 from fastapi import WebSocket, WebSocketException
 
 from app.common.handlers import ErrorCode
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_CODE = 4008
 
 
 class BaseSocketConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    # Every socket gets a bounded send queue drained by its own sender task, so a broadcast
+    # only enqueues and a slow client can't hold up the others. Clients whose queue
+    # overflows or whose send times out are disconnected.
+    def __init__(
+        self,
+        send_queue_size: int = settings.SOCKET_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.SOCKET_SEND_TIMEOUT_SECONDS,
+    ):
+        # key (e.g a user id or a chat group name) -> the open sockets under it
+        self.active_connections: dict[str, set[WebSocket]] = {}
+        self.send_queue_size = send_queue_size
+        self.send_timeout = send_timeout
+        self._senders: dict[WebSocket, tuple[asyncio.Queue, asyncio.Task]] = {}
+        self.dropped_messages = 0
+        self.evicted_connections = 0
+
+    async def connect(self, websocket: WebSocket, key: str):
+        websocket.scope["connection_key"] = key
+        self.active_connections.setdefault(key, set()).add(websocket)
+        if websocket not in self._senders:
+            queue = asyncio.Queue(maxsize=self.send_queue_size)
+            task = asyncio.create_task(self._sender(websocket, queue))
+            self._senders[websocket] = (queue, task)
+
+    def remove_connection(self, websocket: WebSocket):
+        key = websocket.scope.get("connection_key")
+        connections = self.active_connections.get(key, set())
+        connections.discard(websocket)
+        if not connections:
+            self.active_connections.pop(key, None)
+        sender = self._senders.pop(websocket, None)
+        if sender:
+            queue, task = sender
+            if task is not asyncio.current_task():
+                task.cancel()
+            # Unsent data is dropped, marked as done so that queue.join() returns
+            while not queue.empty():
+                queue.get_nowait()
+                queue.task_done()
+
+    def get_connections(self, key: str) -> list[WebSocket]:
+        # A copy, since sockets can come and go while sending
+        return list(self.active_connections.get(key, ()))
+
+    def encode(self, data: dict) -> str:
+        # Done once per broadcast, every recipient then gets the same text frame
+        return orjson.dumps(data).decode()
+
+    def send(self, websocket: WebSocket, data: str):
+        # Queue encoded data for a registered socket without waiting for it to be sent
+        sender = self._senders.get(websocket)
+        if not sender:
+            return
+        try:
+            sender[0].put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped_messages += 1
+            self.evict(websocket, "Too many pending messages")
 
-    async def connect(self, websocket: WebSocket):
-        self.active_connections.append(websocket)
+    async def send_and_wait(self, websocket: WebSocket, data: str):
+        # Queue encoded data like send, but return once it's been sent (or dropped).
+        # Sockets that aren't registered have no sender task and no other writer, so
+        # they're written to directly.
+        sender = self._senders.get(websocket)
+        if not sender:
+            await asyncio.wait_for(websocket.send_text(data), self.send_timeout)
+            return
+        self.send(websocket, data)
+        await sender[0].join()
+
+    async def _sender(self, websocket: WebSocket, queue: asyncio.Queue):
+        while True:
+            data = await queue.get()
+            try:
+                await asyncio.wait_for(websocket.send_text(data), self.send_timeout)
+            except Exception:
+                self.dropped_messages += 1 + queue.qsize()
+                self.evict(websocket, "Couldn't deliver messages in time")
+                return
+            finally:
+                queue.task_done()
+
+    def evict(self, websocket: WebSocket, reason: str):
+        logger.info(f"Disconnecting slow socket consumer: {reason}")
+        self.evicted_connections += 1
+        self.remove_connection(websocket)
+        asyncio.create_task(self._close(websocket, reason))
+
+    async def _close(self, websocket: WebSocket, reason: str):
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=SLOW_CONSUMER_CODE, reason=reason),
+                self.send_timeout,
+            )
+        except Exception:
+            pass
+
+    async def wait_for_sends(self):
+        # Mostly for tests, waits till the queued data has been sent
+        await asyncio.gather(*(queue.join() for queue, _ in self._senders.values()))
+
+    def stats(self) -> dict:
+        queue_sizes = [queue.qsize() for queue, _ in self._senders.values()]
+        return {
+            "connections": len(self._senders),
+            "queued_messages": sum(queue_sizes),
+            "max_queue_depth": max(queue_sizes, default=0),
+            "dropped_messages": self.dropped_messages,
+            "evicted_connections": self.evicted_connections,
+        }
 
     def disconnect(self, code, reason):
         raise WebSocketException(code, reason)
@@ -24,11 +137,12 @@ class BaseSocketConnectionManager:
         return data
 
     async def send_personal_message(self, data: dict, websocket: WebSocket):
-        await websocket.send_json(data)
+        await self.send_and_wait(websocket, self.encode(data))
 
-    async def broadcast(self, data: dict):
-        for connection in self.active_connections:
-            await connection.send_json(data)
+    async def broadcast(self, data: dict, key: str):
+        data = self.encode(data)
+        for connection in self.get_connections(key):
+            self.send(connection, data)
 
     async def send_error_data(
         self,
@@ -46,5 +160,9 @@ class BaseSocketConnectionManager:
         }
         if data:
             err_data["data"] = data
-        await websocket.send_json(err_data)
+        try:
+            # Sent before the socket is closed
+            await self.send_and_wait(websocket, self.encode(err_data))
+        except Exception:
+            pass  # Disconnected anyway
         self.disconnect(code, message)
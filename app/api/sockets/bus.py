@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+import asyncpg
+import orjson
+from piccolo.engine import engine_finder
+from piccolo.querystring import QueryString
+
+from app.api.utils.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+Dispatcher = Callable[[str, bytes], None]
+
+
+# BROADCAST BACKENDS
+# They carry published events (JSON payloads) to the bus of every worker (including the
+# publisher's), which then hands them to its local subscribers.
+
+
+def split_payload(payload: bytes, size: int) -> list[str]:
+    # Chunks of at most size bytes, never ending in the middle of a UTF-8 character
+    chunks, start = [], 0
+    while start < len(payload):
+        end = min(start + size, len(payload))
+        while end < len(payload) and payload[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(payload[start:end].decode())
+        start = end
+    return chunks
+
+
+class InMemoryBroadcastBackend:
+    # Single process only (development and tests)
+    async def start(self, dispatch: Dispatcher):
+        self.dispatch = dispatch
+
+    async def publish(self, channel: str, payload: bytes):
+        self.dispatch(channel, payload)
+
+    async def stop(self):
+        pass
+
+
+class PostgresBroadcastBackend:
+    # Shares events between workers and nodes through postgres LISTEN/NOTIFY.
+    # NOTIFY payloads must be shorter than 8000 bytes, so events are sent in chunks
+    # ("<channel> <event id> <index> <count> <chunk>") that the listeners put back
+    # together. The chunks of an event are notified in one statement, so they're
+    # delivered together.
+    # While the listening connection is down, events are only dispatched locally and it's
+    # reconnected with an increasing delay (up to max_reconnect_interval).
+    pg_channel = "socket_events"
+    max_chunk_size = 7800
+
+    def __init__(
+        self, reconnect_interval: float = 1, max_reconnect_interval: float = 30
+    ):
+        self.reconnect_interval = reconnect_interval
+        self.max_reconnect_interval = max_reconnect_interval
+        self._connection = None
+        self._chunks = TTLCache(max_size=1000, ttl=60)  # event id -> received chunks
+        self._task: asyncio.Task = None
+        self._started = False
+
+    @property
+    def available(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    async def start(self, dispatch: Dispatcher):
+        self.dispatch = dispatch
+        self._started = True
+        await self._connect()
+
+    async def _connect(self):
+        connection = await asyncpg.connect(**engine_finder().config)
+        await connection.add_listener(self.pg_channel, self._on_notification)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+
+    def _on_termination(self, connection):
+        if connection is not self._connection:
+            return
+        self._connection = None
+        self._chunks.clear()  # The rest of partly received events is lost
+        if self._started and not self._task:
+            logger.warning("Socket events listener disconnected, reconnecting")
+            self._task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        interval = self.reconnect_interval
+        try:
+            while self._started and not self.available:
+                try:
+                    await self._connect()
+                except Exception:
+                    logger.exception("Couldn't reconnect the socket events listener")
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, self.max_reconnect_interval)
+        finally:
+            self._task = None
+
+    def _on_notification(self, connection, pid, pg_channel, notification):
+        channel, event_id, index, count, chunk = notification.split(" ", 4)
+        count = int(count)
+        if count > 1:
+            chunks = self._chunks.get(event_id, {})
+            chunks[int(index)] = chunk
+            if len(chunks) < count:
+                self._chunks.set(event_id, chunks)
+                return
+            self._chunks.delete(event_id)
+            chunk = "".join(chunks[index] for index in range(count))
+        self.dispatch(channel, chunk.encode())
+
+    async def publish(self, channel: str, payload: bytes):
+        if not self.available:
+            # Not listening, other workers' events are missed but local ones still go out
+            self.dispatch(channel, payload)
+            return
+        event_id = uuid.uuid4().hex
+        chunks = split_payload(payload, self.max_chunk_size)
+        notifications = [
+            f"{channel} {event_id} {index} {len(chunks)} {chunk}"
+            for index, chunk in enumerate(chunks)
+        ]
+        await engine_finder().run_querystring(
+            QueryString(
+                "SELECT pg_notify({}, notification) FROM "
+                "unnest({}::text[]) WITH ORDINALITY AS n(notification, index) "
+                "ORDER BY index",
+                self.pg_channel,
+                notifications,
+            )
+        )
+
+    async def stop(self):
+        self._started = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._connection:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+
+BROADCAST_BACKENDS = {
+    "memory": InMemoryBroadcastBackend,
+    "postgres": PostgresBroadcastBackend,
+}
+
+
+class EventBus:
+    # Pub/sub between request handlers and the socket managers.
+    # Publishing only schedules the delivery, so handlers never wait on socket I/O.
+    def __init__(self, backend=None):
+        self.backend = backend or InMemoryBroadcastBackend()
+        self.subscribers: dict[str, list[Handler]] = defaultdict(list)
+        self._tasks: set[asyncio.Task] = set()  # Keeps running deliveries referenced
+        self._started = False
+
+    def subscribe(self, channel: str, handler: Handler):
+        self.subscribers[channel].append(handler)
+
+    def unsubscribe(self, channel: str, handler: Handler):
+        if handler in self.subscribers[channel]:
+            self.subscribers[channel].remove(handler)
+
+    async def start(self):
+        await self.backend.start(self.dispatch)
+        self._started = True
+
+    async def stop(self):
+        await self.wait_for_deliveries()
+        await self.backend.stop()
+        self._started = False
+
+    def _create_task(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def publish(self, channel: str, data: dict):
+        # Serialized here whatever the backend, so subscribers always get the JSON data
+        payload = orjson.dumps(data, default=str)
+        if not self._started:
+            # No backend running (e.g outside the app's lifespan), deliver locally
+            self.dispatch(channel, payload)
+            return
+        self._create_task(self._publish(channel, payload))
+
+    async def _publish(self, channel: str, payload: bytes):
+        try:
+            await self.backend.publish(channel, payload)
+        except Exception:
+            logger.exception(f"Couldn't publish event on {channel}")
+
+    def dispatch(self, channel: str, payload: bytes):
+        # Hand an event to the local subscribers
+        data = orjson.loads(payload)
+        for handler in self.subscribers[channel]:
+            self._create_task(self._deliver(channel, handler, data))
+
+    async def _deliver(self, channel: str, handler: Handler, data: dict):
+        try:
+            await handler(data)
+        except Exception:
+            logger.exception(f"Couldn't deliver event on {channel}")
+
+    async def wait_for_deliveries(self):
+        # Mostly for tests and shutdown
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+bus = EventBus(BROADCAST_BACKENDS[settings.SOCKET_BROADCAST_BACKEND]())
@@ -1,4 +1,3 @@
-import json
 from typing import Literal, Union
 from uuid import UUID
 from fastapi import (
@@ -8,15 +7,14 @@ from fastapi import (
     WebSocketException,
 )
 from pydantic import BaseModel
-import websockets
 from app.api.deps import get_current_socket_user
 from app.api.schemas.chat import MessageSchema
 from app.api.sockets.base import BaseSocketConnectionManager
+from app.api.sockets.bus import bus
 from app.common.handlers import ErrorCode
 from app.core.config import settings
 from app.models.accounts.tables import User
-from app.models.chat.tables import Chat, Message
-import os
+from app.models.chat.tables import Chat, ChatMember, Message
 
 chat_socket_router = APIRouter()
 
@@ -28,11 +26,11 @@ class SocketMessageSchema(BaseModel):
 
 class ChatSocketManager(BaseSocketConnectionManager):
     async def connect(self, websocket: WebSocket, chat_id):
-        # Verify chat ID & membership
+        # Verify chat ID & membership (once per socket)
         user = websocket.scope["user"]
         if user != settings.SOCKET_SECRET:
             await self.validate_chat_membership(websocket, chat_id)
-        self.active_connections.append(websocket)
+        await super().connect(websocket, websocket.scope["group_name"])
 
     async def validate_chat_membership(self, websocket: WebSocket, id: str):
         user = websocket.scope["user"]
@@ -41,8 +39,8 @@ class ChatSocketManager(BaseSocketConnectionManager):
         if not chat and not obj_user:  # If no chat nor user
             await self.send_error_data(websocket, "Invalid ID", "invalid_input", 4004)
 
-        if (
-            chat and user_id not in chat.user_ids and user_id != chat.owner
+        if chat and not await ChatMember.is_member(
+            chat.id, user_id
         ):  # If chat but user is not a member
             await self.send_error_data(
                 websocket, "You're not a member of this chat", "invalid_member", 4001
@@ -93,31 +91,29 @@ class ChatSocketManager(BaseSocketConnectionManager):
                     websocket, "Message isn't yours", ErrorCode.INVALID_OWNER, 4001
                 )
 
-            data = message_data | {
-                "chat_id": str(message.chat),
-                "created_at": str(message.created_at),
-                "updated_at": str(message.updated_at),
-            }
-            message_data = data | MessageSchema.model_validate(message).model_dump(
-                exclude={"id", "chat", "created_at", "updated_at"}, by_alias=True
-            )
+            message_data = get_message_socket_data(message, status)
         return message_data
 
     async def broadcast(self, data: dict, group_name):
-        for connection in self.active_connections:
-            # Only true receivers should access the data
-            if connection.scope["group_name"] == group_name:
-                user = connection.scope["user"]
-                obj_user = connection.scope.get("obj_user")
-                if obj_user:
-                    # Ensure that reading messages from a user id can only be done by the owner
-                    if user == obj_user:
-                        await connection.send_json(data)
-                else:
-                    await connection.send_json(data)
+        # Only true receivers (the group's sockets) should access the data
+        data = self.encode(data)
+        for connection in self.get_connections(group_name):
+            user = connection.scope["user"]
+            obj_user = connection.scope.get("obj_user")
+            if obj_user:
+                # Ensure that reading messages from a user id can only be done by the owner
+                if user == obj_user:
+                    self.send(connection, data)
+            else:
+                self.send(connection, data)
+
+    async def handle_event(self, event: dict):
+        # Events published on the bus (e.g message deletions from the REST endpoints)
+        await self.broadcast(event["data"], event["group_name"])
 
 
 manager = ChatSocketManager()
+bus.subscribe("chats", manager.handle_event)
 
 
 @chat_socket_router.websocket("/api/v3/ws/chats/{chat_id}")
@@ -127,36 +123,46 @@ async def websocket_endpoint(
     user: Union[User, str] = Depends(get_current_socket_user),
 ):
     websocket.scope["user"] = user
+    group_name = f"chat_{chat_id}"
+    websocket.scope["group_name"] = group_name
     try:
+        await manager.connect(websocket, chat_id)
         while True:
-            group_name = f"chat_{chat_id}"
-            websocket.scope["group_name"] = group_name
-            await manager.connect(websocket, chat_id)
             data = await manager.receive_data(websocket)
-            await manager.broadcast(data, group_name)
+            bus.publish("chats", {"group_name": group_name, "data": data})
     except Exception as e:
-        if websocket in manager.active_connections:
-            manager.active_connections.remove(websocket)
+        manager.remove_connection(websocket)
         if isinstance(e, WebSocketException):
             await websocket.close()
 
 
-# Send message deletion details in websocket
-async def send_message_deletion_in_socket(
-    secured: bool, host: str, chat_id: UUID, message_id: UUID
-):
-    if os.environ.get("ENVIRONMENT") == "testing":
-        return
-    websocket_scheme = "wss://" if secured else "ws://"
-    uri = f"{websocket_scheme}{host}/api/v3/ws/chats/{chat_id}"
+def get_message_socket_data(message: Message, status: str) -> dict:
+    # message must have its sender (with avatar) and file
+    data = {
+        "id": str(message.id),
+        "status": status,
+        "chat_id": str(message.chat),
+        "created_at": str(message.created_at),
+        "updated_at": str(message.updated_at),
+    }
+    return data | MessageSchema.model_validate(message).model_dump(
+        exclude={"id", "chat", "created_at", "updated_at"}, by_alias=True
+    )
+
+
+# Send a created or updated message to the chat socket manager(s)
+def send_message_in_socket(message: Message, status: str, username: str = None):
+    data = get_message_socket_data(message, status)
+    bus.publish("chats", {"group_name": f"chat_{message.chat}", "data": data})
+    if username:
+        # First message of a DM, the recipient may only be listening with their username
+        bus.publish("chats", {"group_name": f"chat_{username}", "data": data})
+
+
+# Send message deletion details to the chat socket manager(s)
+def send_message_deletion_in_socket(chat_id: UUID, message_id: UUID):
     chat_data = {
         "id": str(message_id),
         "status": "DELETED",
     }
-    headers = [
-        ("Authorization", settings.SOCKET_SECRET),
-    ]
-    async with websockets.connect(uri, extra_headers=headers) as websocket:
-        # Send the message to the WebSocket server
-        await websocket.send(json.dumps(chat_data))
-        await websocket.close()
+    bus.publish("chats", {"group_name": f"chat_{chat_id}", "data": chat_data})
@@ -9,9 +9,10 @@ from fastapi import (
 from pydantic import BaseModel
 from app.api.deps import get_current_socket_user
 from app.api.sockets.base import BaseSocketConnectionManager
+from app.api.sockets.bus import bus
 from app.common.handlers import ErrorCode
 from app.models.accounts.tables import User
-from app.models.profiles.tables import Notification
+from app.models.profiles.tables import NotificationRecipient
 
 notification_socket_router = APIRouter()
 
@@ -23,6 +24,12 @@ class NotificationData(BaseModel):
 
 
 class NotificationSocketManager(BaseSocketConnectionManager):
+    # Sockets are registered under their user's id (a user can be connected from several devices)
+    async def connect(self, websocket: WebSocket):
+        user = websocket.scope["user"]
+        if user:  # In app connections (socket secret) only send data
+            await super().connect(websocket, str(user.id))
+
     async def receive_data(self, websocket: WebSocket):
         data = await super().receive_data(websocket)
         # Ensure data is a notification data. That means it align with the Notification data above
@@ -34,20 +41,16 @@ class NotificationSocketManager(BaseSocketConnectionManager):
             )
         return data
 
-    async def broadcast(self, data: dict):
-        for connection in self.active_connections:
-            user = connection.scope["user"]
-            if not user:
-                continue
-            user_is_among_receivers = await Notification.exists().where(
-                Notification.receiver_ids.any(user.id), Notification.id == data["id"]
-            )
-            if user_is_among_receivers:
-                # Only true receivers should access the data
-                await connection.send_json(data)
+    async def broadcast(self, event: dict):
+        # Only true receivers should access the data
+        data = self.encode(event["data"])
+        for receiver_id in event["receiver_ids"]:
+            for connection in self.get_connections(receiver_id):
+                self.send(connection, data)
 
 
 manager = NotificationSocketManager()
+bus.subscribe("notifications", manager.broadcast)
 
 
 @notification_socket_router.websocket("/api/v3/ws/notifications")
@@ -64,13 +67,17 @@ async def websocket_endpoint(
             if isinstance(user, str):
                 # in app connection (with socket secret)
                 # Send data
-                await manager.broadcast(data)
+                receiver_ids = await NotificationRecipient.get_user_ids(data["id"])
+                if receiver_ids:
+                    receiver_ids = [str(id) for id in receiver_ids]
+                    bus.publish(
+                        "notifications", {"receiver_ids": receiver_ids, "data": data}
+                    )
             else:
                 await manager.send_error_data(
                     websocket, "Unauthorized to send data", ErrorCode.NOT_ALLOWED, 4001
                 )
     except Exception as e:
-        if websocket in manager.active_connections:
-            manager.active_connections.remove(websocket)
+        manager.remove_connection(websocket)
         if isinstance(e, WebSocketException):
             await websocket.close()
@@ -3,7 +3,8 @@ from piccolo.table import create_db_tables, drop_db_tables
 from piccolo.conf.apps import Finder
 
 from app.main import app
-from app.api.utils.auth import Authentication
+from app.api.utils.auth import Authentication, user_cache
+from app.api.utils.paginators import CachedCount
 from pytest_postgresql import factories
 from pytest_postgresql.janitor import DatabaseJanitor
 from httpx import AsyncClient
@@ -58,6 +59,8 @@ async def setup_db(database, mocker):
     await create_db_tables(*TABLES)
     yield
     await drop_db_tables(*TABLES)
+    CachedCount.clear_cache()
+    user_cache.clear()
 
 
 @pytest.fixture
@@ -111,9 +114,7 @@ async def another_verified_user():
 
 @pytest.fixture
 async def authorized_client(verified_user: User, client):
-    access = await Authentication.create_access_token(
-        {"user_id": str(verified_user.id), "username": verified_user.username}
-    )
+    access = await Authentication.create_user_access_token(verified_user)
     refresh = await Authentication.create_refresh_token()
     verified_user.access_token = access
     verified_user.refresh_token = refresh
@@ -124,12 +125,7 @@ async def authorized_client(verified_user: User, client):
 
 @pytest.fixture
 async def another_verified_user_tokens(another_verified_user: User):
-    access = await Authentication.create_access_token(
-        {
-            "user_id": str(another_verified_user.id),
-            "username": another_verified_user.username,
-        }
-    )
+    access = await Authentication.create_user_access_token(another_verified_user)
     refresh = await Authentication.create_refresh_token()
     another_verified_user.access_token = access
     another_verified_user.refresh_token = refresh
@@ -216,18 +212,16 @@ async def friend(verified_user: User, another_verified_user: User):
 @pytest.fixture
 async def chat(verified_user, another_verified_user):
     # Create Chat
-    chat = await Chat.objects().create(
-        owner=verified_user, user_ids=[another_verified_user.id]
-    )
+    chat = await Chat.create_with_members(verified_user, [another_verified_user.id])
     return chat
 
 
 @pytest.fixture
 async def group_chat(verified_user, another_verified_user):
     # Create Group Chat
-    chat = await Chat.objects().create(
-        owner=verified_user,
-        user_ids=[another_verified_user.id],
+    chat = await Chat.create_with_members(
+        verified_user,
+        [another_verified_user.id],
         name="My New Group",
         ctype="GROUP",
         description="This is the description of my group chat",
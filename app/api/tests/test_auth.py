@@ -1,6 +1,8 @@
-from app.api.utils.auth import Authentication
+import asyncio
+from app.api.utils.auth import Authentication, UserCache
+from app.api.utils.hashers import password_hasher
 from app.common.handlers import ErrorCode
-from app.models.accounts.tables import Otp
+from app.models.accounts.tables import Otp, User
 
 BASE_URL_PATH = "/api/v3/auth"
 
@@ -146,6 +148,19 @@ async def test_login(mocker, client, test_user):
         "data": {"access": mocker.ANY, "refresh": mocker.ANY},
     }
 
+    # Test for busy password hasher
+    mocker.patch.object(password_hasher, "max_queue_size", 0)
+    response = await client.post(
+        f"{BASE_URL_PATH}/login",
+        json={"email": test_user.email, "password": "testpassword"},
+    )
+    assert response.status_code == 503
+    assert response.json() == {
+        "status": "failure",
+        "code": ErrorCode.SERVER_ERROR,
+        "message": "Server is busy, try again later",
+    }
+
 
 async def test_refresh_token(mocker, client, verified_user):
     # Test for invalid refresh token (invalid or expired)
@@ -276,3 +291,87 @@ async def test_logout(authorized_client):
         "code": ErrorCode.INVALID_TOKEN,
         "message": "Auth Token is Invalid or Expired!",
     }
+
+    # Ensures the logged out token can't be used again, even though it was cached
+    response = await authorized_client.get(f"{BASE_URL_PATH}/logout")
+    assert response.status_code == 401
+    assert response.json() == {
+        "status": "failure",
+        "code": ErrorCode.INVALID_TOKEN,
+        "message": "Auth Token is Invalid or Expired!",
+    }
+
+
+async def test_stateless_access_token(mocker, client, verified_user):
+    mocker.patch("app.api.utils.auth.settings.ACCESS_TOKEN_MODE", "stateless")
+    login_data = {"email": verified_user.email, "password": "testpassword"}
+    response = await client.post(f"{BASE_URL_PATH}/login", json=login_data)
+    old_access = response.json()["data"]["access"]
+
+    # Ensures a new login revokes the previously issued access token
+    response = await client.post(f"{BASE_URL_PATH}/login", json=login_data)
+    access = response.json()["data"]["access"]
+    response = await client.get(
+        f"{BASE_URL_PATH}/logout", headers={"Authorization": f"Bearer {old_access}"}
+    )
+    assert response.status_code == 401
+
+    # Ensures the current token is verified without matching the stored token
+    await User.update({User.access_token: None}).where(User.id == verified_user.id)
+    headers = {"Authorization": f"Bearer {access}"}
+    response = await client.get(f"{BASE_URL_PATH}/logout", headers=headers)
+    assert response.status_code == 200
+
+    # Ensures the logged out token is revoked
+    response = await client.get(f"{BASE_URL_PATH}/logout", headers=headers)
+    assert response.status_code == 401
+
+
+async def test_concurrent_token_issuance(client, verified_user):
+    # Ensures concurrent logins each get their own token version
+    login_data = {"email": verified_user.email, "password": "testpassword"}
+    responses = await asyncio.gather(
+        *[client.post(f"{BASE_URL_PATH}/login", json=login_data) for _ in range(3)]
+    )
+    tokens = [response.json()["data"] for response in responses]
+    versions = [
+        (await Authentication.decode_jwt(token["access"]))["ver"] for token in tokens
+    ]
+    assert len(set(versions)) == 3
+    user = await User.objects().get(User.id == verified_user.id)
+    assert user.token_version == max(versions)
+
+    # Ensures a refresh token can only be used once, even concurrently
+    refresh_data = {"refresh": user.refresh_token}
+    responses = await asyncio.gather(
+        *[client.post(f"{BASE_URL_PATH}/refresh", json=refresh_data) for _ in range(2)]
+    )
+    assert sorted(response.status_code for response in responses) == [201, 401]
+
+
+async def test_user_cache_listener_reconnects(database, authorized_client):
+    cache = UserCache(max_size=10, ttl=60, reconnect_interval=0.1)
+    await cache.listen(database.config)
+    try:
+        token = authorized_client.headers["Authorization"].split()[-1]
+        user = await User.objects().first()
+        cache.set(token, user)
+        assert cache.get(token)
+
+        # Ensures entries cached before a disconnection are dropped on reconnection
+        pid = cache._connection.get_server_pid()
+        await User.raw("SELECT pg_terminate_backend({})", pid)
+        for _ in range(50):
+            if cache._connection.get_server_pid() != pid and cache.available:
+                break
+            await asyncio.sleep(0.1)
+        assert cache.available
+        assert not cache.get(token)
+
+        # Ensures invalidations are received again once reconnected
+        cache.set(token, user)
+        await User.raw("SELECT pg_notify({}, {})", cache.channel, str(user.id))
+        await asyncio.sleep(0.1)
+        assert not cache.get(token)
+    finally:
+        await cache.close()
@@ -1,6 +1,9 @@
+import pytest
 import uuid
 
+from app.api.sockets.bus import bus
 from app.common.handlers import ErrorCode
+from app.models.chat.tables import Chat, ChatMember, Message
 
 
 BASE_URL_PATH = "/api/v3/chats"
@@ -27,8 +30,14 @@ async def test_send_message(authorized_client, chat, mocker):
     }
 
     # Verify the requests suceeds with valid chat id
+    handler = mocker.AsyncMock()
+    bus.subscribe("chats", handler)
     message_data["chat_id"] = str(chat.id)
-    response = await authorized_client.post(BASE_URL_PATH, json=message_data)
+    try:
+        response = await authorized_client.post(BASE_URL_PATH, json=message_data)
+        await bus.wait_for_deliveries()
+    finally:
+        bus.unsubscribe("chats", handler)
     assert response.status_code == 201
     assert response.json() == {
         "status": "success",
@@ -43,6 +52,23 @@ async def test_send_message(authorized_client, chat, mocker):
             "file_upload_data": None,
         },
     }
+
+    # Verify the message was sent to the chat's socket group
+    handler.assert_awaited_once_with(
+        {
+            "group_name": f"chat_{chat.id}",
+            "data": {
+                "id": response.json()["data"]["id"],
+                "status": "CREATED",
+                "chat_id": str(chat.id),
+                "created_at": mocker.ANY,
+                "updated_at": mocker.ANY,
+                "sender": mocker.ANY,
+                "text": message_data["text"],
+                "file": None,
+            },
+        }
+    )
     # You can test for other error responses yourself
 
 
@@ -85,6 +111,9 @@ async def test_retrieve_chat_messages(
                 "per_page": 400,
                 "current_page": 1,
                 "last_page": 1,
+                "last_page_estimated": False,
+                "next_cursor": None,
+                "prev_cursor": None,
                 "items": [
                     {
                         "id": str(message.id),
@@ -108,7 +137,40 @@ async def test_retrieve_chat_messages(
     }
 
 
-async def test_update_group_chat(authorized_client, group_chat, another_verified_user):
+async def test_retrieve_chat_messages_by_cursor(authorized_client, message):
+    chat = message.chat
+    for index in range(2):
+        latest = await Message.objects().create(
+            chat=chat, sender=message.sender, text=f"Message {index}"
+        )
+
+    # Verify the latest message stays the chat's latest on an older page
+    url = f"{BASE_URL_PATH}/{chat.id}?page_size=2"
+    response = await authorized_client.get(url)
+    next_cursor = response.json()["data"]["messages"]["next_cursor"]
+    response = await authorized_client.get(f"{url}&cursor={next_cursor}")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [item["text"] for item in data["messages"]["items"]] == [message.text]
+    assert data["chat"]["latest_message"]["text"] == latest.text
+
+
+async def test_retrieve_chat_with_oneself(authorized_client, verified_user):
+    message_data = {"username": verified_user.username, "text": "Note to self"}
+    response = await authorized_client.post(BASE_URL_PATH, json=message_data)
+    assert response.status_code == 201
+
+    # Verify the owner is listed as the user of a dm with oneself
+    chat_id = response.json()["data"]["chat_id"]
+    response = await authorized_client.get(f"{BASE_URL_PATH}/{chat_id}")
+    assert response.status_code == 200
+    users = response.json()["data"]["users"]
+    assert [user["username"] for user in users] == [verified_user.username]
+
+
+async def test_update_group_chat(
+    authorized_client, group_chat, another_verified_user, mocker
+):
     chat_data = {
         "name": "Updated Group chat name",
         "description": "Updated group chat description",
@@ -147,6 +209,23 @@ async def test_update_group_chat(authorized_client, group_chat, another_verified
             "file_upload_data": None,
         },
     }
+
+    # Verify the members are left as they were when the update fails
+    chat_data["usernames_to_remove"] = [another_verified_user.username]
+    mocker.patch.object(Chat, "save", side_effect=Exception("Failed"))
+    with pytest.raises(Exception, match="Failed"):
+        await authorized_client.patch(
+            f"{BASE_URL_PATH}/{group_chat.id}", json=chat_data
+        )
+    assert await ChatMember.is_member(group_chat.id, another_verified_user.id)
+    mocker.stopall()
+
+    # Verify a group whose other users were all removed lists no users
+    response = await authorized_client.patch(
+        f"{BASE_URL_PATH}/{group_chat.id}", json=chat_data
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["users"] == []
     # You can test for other error responses yourself
 
 
@@ -1,4 +1,10 @@
+import pytest
+from app.api.sockets.bus import bus
 from app.common.handlers import ErrorCode
+from app.models.feed.commands.reconcile_counts import reconcile_counts
+from app.models.feed.tables import Post, Reaction
+from app.models.feed.utils import counter_buffer
+from app.models.profiles.tables import Notification, NotificationRecipient
 import uuid
 
 BASE_URL_PATH = "/api/v3/feed"
@@ -14,6 +20,9 @@ async def test_retrieve_posts(client, post, mocker):
             "per_page": 50,
             "current_page": 1,
             "last_page": 1,
+            "last_page_estimated": False,
+            "next_cursor": None,
+            "prev_cursor": None,
             "posts": [
                 {
                     "author": mocker.ANY,
@@ -29,6 +38,80 @@ async def test_retrieve_posts(client, post, mocker):
         },
     }
 
+    # Verify the cached count gives the same response, reported as an estimate
+    cached_response = await client.get(f"{BASE_URL_PATH}/posts")
+    expected = response.json()
+    expected["data"]["last_page_estimated"] = True
+    assert cached_response.json() == expected
+
+
+async def test_retrieve_posts_pagination(client, verified_user):
+    posts = [
+        await Post.objects().create(author=verified_user, text=f"Post {i}")
+        for i in range(50)
+    ]
+    response = await client.get(f"{BASE_URL_PATH}/posts")
+    assert response.json()["data"]["last_page"] == 1
+    posts.append(await Post.objects().create(author=verified_user, text="Post 50"))
+
+    # Verify the second page holds the remaining post, though the cached count is behind
+    response = await client.get(f"{BASE_URL_PATH}/posts?page=2")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["current_page"] == 2
+    assert data["last_page"] == 2
+    assert data["last_page_estimated"] is True
+    assert [post["slug"] for post in data["posts"]] == [posts[0].slug]
+
+    # Verify the request fails for an out of range page
+    response = await client.get(f"{BASE_URL_PATH}/posts?page=3")
+    assert response.status_code == 400
+    assert response.json() == {
+        "status": "failure",
+        "code": ErrorCode.INVALID_PAGE,
+        "message": "Page number is out of range",
+    }
+
+
+async def test_retrieve_posts_by_cursor(client, verified_user):
+    posts = [
+        await Post.objects().create(author=verified_user, text=f"Post {i}")
+        for i in range(51)
+    ]
+
+    # Verify the first page gives a cursor to the next one
+    response = await client.get(f"{BASE_URL_PATH}/posts")
+    data = response.json()["data"]
+    assert len(data["posts"]) == 50
+    assert data["prev_cursor"] is None
+    next_cursor = data["next_cursor"]
+
+    # Verify the cursor seeks past the first page, even with new posts coming in
+    await Post.objects().create(author=verified_user, text="Newest post")
+    response = await client.get(f"{BASE_URL_PATH}/posts?cursor={next_cursor}")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [post["slug"] for post in data["posts"]] == [posts[0].slug]
+    assert data["current_page"] is None
+    assert data["next_cursor"] is None
+
+    # Verify the previous cursor goes back to the rows before it
+    response = await client.get(f"{BASE_URL_PATH}/posts?cursor={data['prev_cursor']}")
+    data = response.json()["data"]
+    assert [post["slug"] for post in data["posts"]] == [
+        post.slug for post in reversed(posts[1:])
+    ]
+    assert data["prev_cursor"] is not None  # The newest post
+
+    # Verify the request fails for an invalid cursor
+    response = await client.get(f"{BASE_URL_PATH}/posts?cursor=invalid")
+    assert response.status_code == 400
+    assert response.json() == {
+        "status": "failure",
+        "code": ErrorCode.INVALID_VALUE,
+        "message": "Invalid cursor",
+    }
+
 
 async def test_create_post(authorized_client, mocker):
     post_dict = {"text": "My new Post"}
@@ -179,6 +262,7 @@ async def test_retrieve_reactions(client, reaction):
             "per_page": 50,
             "current_page": 1,
             "last_page": 1,
+            "last_page_estimated": False,
             "reactions": [
                 {
                     "id": str(reaction.id),
@@ -216,6 +300,24 @@ async def test_create_reaction(authorized_client, post, mocker):
     }
 
 
+async def test_create_reaction_notifies_the_author(
+    client, post, another_verified_user_tokens
+):
+    headers = {"Authorization": f"Bearer {another_verified_user_tokens['access']}"}
+    url = f"{BASE_URL_PATH}/reactions/POST/{post.slug}"
+    for rtype in ("LIKE", "LOVE"):
+        response = await client.post(url, json={"rtype": rtype}, headers=headers)
+        assert response.status_code == 201
+
+    # Verify one notification was created, with the post's author as its recipient
+    notifications = await Notification.select(Notification.id).where(
+        Notification.ntype == "REACTION", Notification.post == post.id
+    )
+    assert len(notifications) == 1
+    receiver_ids = await NotificationRecipient.get_user_ids(notifications[0]["id"])
+    assert receiver_ids == [post.author.id]
+
+
 async def test_delete_reaction(authorized_client, reaction):
     # Test for invalid reaction id
     response = await authorized_client.delete(
@@ -261,6 +363,9 @@ async def test_retrieve_comments(client, comment):
             "per_page": 50,
             "current_page": 1,
             "last_page": 1,
+            "last_page_estimated": False,
+            "next_cursor": None,
+            "prev_cursor": None,
             "comments": [
                 {
                     "author": {
@@ -339,6 +444,9 @@ async def test_retrieve_comment_with_replies(client, reply):
                 "per_page": 50,
                 "current_page": 1,
                 "last_page": 1,
+                "last_page_estimated": False,
+                "next_cursor": None,
+                "prev_cursor": None,
                 "items": [
                     {
                         "author": {
@@ -483,3 +591,60 @@ async def test_delete_reply(authorized_client, reply):
         "message": "Reply Deleted",
     }
     # You can test for other error responses yourself
+
+
+async def test_buffered_reactions_count(authorized_client, post, mocker):
+    mocker.patch("app.models.feed.utils.settings.COUNTER_BUFFER_ENABLED", True)
+    response = await authorized_client.post(
+        f"{BASE_URL_PATH}/reactions/POST/{post.slug}", json={"rtype": "LOVE"}
+    )
+    assert response.status_code == 201
+
+    # Test that the count is only written on flush
+    post = await Post.objects().get(Post.id == post.id)
+    assert post.reactions_count == 0
+    await counter_buffer.flush()
+    post = await Post.objects().get(Post.id == post.id)
+    assert post.reactions_count == 1
+
+    # Test that rolled back reactions leave no delta behind
+    with pytest.raises(ValueError):
+        async with Post._meta.db.transaction():
+            await Reaction(user=post.author, rtype="LIKE", post=post.id).save()
+            raise ValueError("Rolled back")
+    with pytest.raises(Exception):
+        await Reaction(user=uuid.uuid4(), rtype="LIKE", post=post.id).save()
+    await counter_buffer.flush()
+    post = await Post.objects().get(Post.id == post.id)
+    assert post.reactions_count == 1
+
+    # Test that reconciliation repairs drifted counts
+    await Post.update({Post.reactions_count: 10, Post.comments_count: 3}).where(
+        Post.id == post.id
+    )
+    await reconcile_counts()
+    post = await Post.objects().get(Post.id == post.id)
+    assert post.reactions_count == 1
+    assert post.comments_count == 0
+
+
+async def test_comment_notification_published(another_authorized_client, post, mocker):
+    handler = mocker.AsyncMock()
+    bus.subscribe("notifications", handler)
+    try:
+        response = await another_authorized_client.post(
+            f"{BASE_URL_PATH}/posts/{post.slug}/comments", json={"text": "Nice"}
+        )
+        assert response.status_code == 201
+        await bus.wait_for_deliveries()
+    finally:
+        bus.unsubscribe("notifications", handler)
+
+    # Test that the notification reached the bus subscribers
+    handler.assert_awaited_once()
+    event = handler.await_args.args[0]
+    assert event["receiver_ids"] == [str(post.author.id)]
+    data = event["data"]
+    assert data["status"] == "CREATED"
+    assert data["ntype"] == "COMMENT"
+    assert data["comment_slug"] == response.json()["data"]["slug"]
@@ -0,0 +1,142 @@
+import io
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from app.api.utils.file_processors import (
+    FileProcessor,
+    FileUploader,
+    get_cached_file_url,
+)
+from app.api.utils.responses import SendfileResponse
+from app.api.utils.storage import LocalStorage
+
+
+class StubUploadHandler(BaseHTTPRequestHandler):
+    # Answers with the queued (status, body) responses, then with a successful upload
+    responses = []
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.requests.append((self.headers.get("Content-Range"), body))
+        status, data = (
+            self.responses.pop(0)
+            if self.responses
+            else (200, json.dumps({"secure_url": "https://stub/file.png"}))
+        )
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(data.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = HTTPServer(("127.0.0.1", 0), StubUploadHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StubUploadHandler.responses, StubUploadHandler.requests = [], []
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+async def test_upload_file_async(stub_server):
+    uploader = FileUploader(concurrency=2, chunk_size=4, retry_backoff=0)
+    file = io.BytesIO(b"0123456789")
+
+    # Test that transient failures are retried and the body is sent in chunks
+    StubUploadHandler.responses = [(503, "Service Unavailable")]
+    result = await uploader.upload(file, "key", "avatars", upload_prefix=stub_server)
+    assert result.success
+    assert result.attempts == 2
+    assert result.key == "socialnet-v3/avatars/key"
+    assert result.url == "https://stub/file.png"
+    content_ranges = [request[0] for request in StubUploadHandler.requests]
+    assert content_ranges == [
+        "bytes 0-3/10",  # Failed attempt
+        "bytes 0-3/10",
+        "bytes 4-7/10",
+        "bytes 8-9/10",
+    ]
+    assert not file.closed
+
+    # Test that other failures are reported without retries
+    StubUploadHandler.requests = []
+    StubUploadHandler.responses = [(400, json.dumps({"error": {"message": "Invalid"}}))]
+    result = await uploader.upload(file, "key", "avatars", upload_prefix=stub_server)
+    assert not result.success
+    assert result.attempts == 1
+    assert result.error == "Invalid"
+    assert len(StubUploadHandler.requests) == 1
+
+    uploader.shutdown()
+
+
+async def test_local_storage(mocker, tmp_path, client):
+    storage = LocalStorage(root=str(tmp_path), base_url="/media")
+    mocker.patch("app.api.routes.media.storage", new=storage)
+    mocker.patch("app.api.utils.file_processors.storage", new=storage)
+
+    # Test that a file can be uploaded with its signature
+    data = storage.generate_file_signature("key", "posts")
+    upload_url = f"/media/{data['public_id']}"
+    params = {"signature": data["signature"], "timestamp": data["timestamp"]}
+    response = await client.put(upload_url, params=params, content=b"image")
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "message": "File uploaded"}
+    assert (tmp_path / "socialnet-v3/posts/key").read_bytes() == b"image"
+
+    # Test that uploads with an invalid signature are rejected
+    params["signature"] = "invalid"
+    response = await client.put(upload_url, params=params, content=b"image")
+    assert response.status_code == 401
+
+    # Test that the file is served from its generated url
+    url = storage.generate_file_url("key", "posts", "image/png")
+    assert url == "/media/socialnet-v3/posts/key.png"
+    response = await client.get(url)
+    assert response.status_code == 200
+    assert response.content == b"image"
+    assert response.headers["content-type"] == "image/png"
+    response = await client.get("/media/socialnet-v3/posts/invalid.png")
+    assert response.status_code == 404
+
+    # Test that the file is handed to servers supporting zero-copy sends
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        # The file must still be open until the response is complete
+        assert not messages[1]["file"].closed
+        return {"type": "http.disconnect"}
+
+    file_response = SendfileResponse(tmp_path / "socialnet-v3/posts/key")
+    scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+    await file_response(scope, receive, send)
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert messages[1]["file"].name == str(tmp_path / "socialnet-v3/posts/key")
+    assert messages[1]["file"].closed
+
+    # Test that server-side uploads go to the storage too
+    result = await FileUploader().upload(io.BytesIO(b"avatar"), "key", "avatars")
+    assert result.success
+    assert (tmp_path / "socialnet-v3/avatars/key").read_bytes() == b"avatar"
+
+
+async def test_generate_file_url_errors_are_not_cached(mocker):
+    get_cached_file_url.cache_clear()
+    storage = mocker.patch("app.api.utils.file_processors.storage")
+
+    # Test that a failing call is retried on the next one, then memoized once successful
+    storage.generate_file_url.side_effect = [Exception("Unavailable"), "/url.png"]
+    assert FileProcessor.generate_file_url("key", "posts", "image/png") is None
+    assert FileProcessor.generate_file_url("key", "posts", "image/png") == "/url.png"
+    assert FileProcessor.generate_file_url("key", "posts", "image/png") == "/url.png"
+    assert storage.generate_file_url.call_count == 2
+    get_cached_file_url.cache_clear()
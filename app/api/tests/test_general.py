@@ -1,3 +1,16 @@
+import asyncio
+from httpx import AsyncClient
+from piccolo.conf.apps import Finder
+from app.api.utils.auth import Authentication
+from app.core.database import (
+    InstrumentedPostgresEngine,
+    ReadReplicaMiddleware,
+    is_read_statement,
+)
+from app.main import app
+from app.models.accounts.tables import User
+
+
 async def test_retrieve_sitedetail(client):
     # Check response validity
     response = await client.get("/api/v3/general/site-detail")
@@ -7,3 +20,93 @@ async def test_retrieve_sitedetail(client):
     assert json_resp["message"] == "Site Details fetched"
     keys = ["name", "email", "phone", "address", "fb", "tw", "wh", "ig"]
     assert all(item in json_resp["data"] for item in keys)
+
+
+async def test_metrics(mocker, database, client):
+    engine = InstrumentedPostgresEngine(
+        config=database.config, pool_options={"min_size": 1, "max_size": 1}
+    )
+    mocker.patch("app.piccolo_conf.DB", new=engine)
+    await engine.start_connection_pool()
+    try:
+        # Test that waits for the only connection are measured
+        async with engine.transaction():
+            query = asyncio.create_task(engine._run_in_pool("SELECT 1"))
+            await asyncio.sleep(0.05)
+            assert engine.pool_stats()["waiting"] == 1
+        await query
+
+        # Test that metrics are only served with the configured token
+        response = await client.get("/api/v3/metrics")
+        assert response.status_code == 404
+        mocker.patch("app.api.deps.settings.METRICS_TOKEN", "metrics-token")
+        response = await client.get(
+            "/api/v3/metrics", headers={"Authorization": "Bearer invalid"}
+        )
+        assert response.status_code == 401
+        response = await client.get(
+            "/api/v3/metrics", headers={"Authorization": "Bearer metrics-token"}
+        )
+        assert response.status_code == 200
+        pool_stats = response.json()["database_pool"]
+        assert pool_stats["max_size"] == 1
+        assert pool_stats["acquisitions"] == 2
+        assert pool_stats["in_use"] == 0
+        assert pool_stats["saturation_events"] == 1
+        assert pool_stats["max_wait_ms"] >= 40
+        assert "password_hasher" in response.json()
+    finally:
+        await engine.close_connection_pool()
+
+
+async def test_read_replica_routing(mocker, database, verified_user):
+    replica = InstrumentedPostgresEngine(config=database.config, extensions=())
+    engine = InstrumentedPostgresEngine(config=database.config, replica=replica)
+    for table in Finder().get_table_classes():
+        mocker.patch.object(table._meta, "_db", new=engine)
+    await engine.replica_guard.check()
+    assert engine.replica_guard.lag == 0
+    replica_queries = mocker.spy(replica, "run_querystring")
+
+    middleware = ReadReplicaMiddleware(app, read_your_writes=5)
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        # Test that reads go to the replica and that reads following a write don't
+        response = await client.get("/api/v3/general/site-detail")  # Select, insert
+        assert replica_queries.call_count == 1
+        marker = response.headers["x-last-write"]
+        assert client.cookies["last-write"] == marker
+        await client.get("/api/v3/general/site-detail")
+        assert replica_queries.call_count == 1
+
+        # Test that reads go to the replica again without the marker, and that
+        # statements are classified by what they do (e.g an EXPLAIN reads)
+        client.cookies.clear()
+        response = await client.get("/api/v3/profiles")
+        assert response.status_code == 200
+        assert replica_queries.call_count > 1
+        assert "x-last-write" not in response.headers
+        assert not is_read_statement("SELECT pg_notify('channel', 'payload')")
+        assert is_read_statement('EXPLAIN (FORMAT JSON) SELECT "user"."id" FROM "user"')
+
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        # Test that clients read their writes, e.g after a logout (a GET request)
+        access = await Authentication.create_user_access_token(verified_user)
+        verified_user.access_token = access
+        await verified_user.save([User.access_token])
+        headers = {"Authorization": f"Bearer {access}"}
+        response = await client.get("/api/v3/auth/logout", headers=headers)
+        assert response.status_code == 200
+        marker = response.headers["x-last-write"]
+        client.cookies.clear()  # The header works for clients without cookies too
+        count = replica_queries.call_count
+        await client.get("/api/v3/profiles", headers={"x-last-write": marker})
+        assert replica_queries.call_count == count
+
+    middleware = ReadReplicaMiddleware(app, read_your_writes=5)
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        # Test that reads fall back to the primary while the replica lags
+        engine.replica_guard.lag = 10
+        count = replica_queries.call_count
+        response = await client.get("/api/v3/general/site-detail")
+        assert response.status_code == 200
+        assert replica_queries.call_count == count
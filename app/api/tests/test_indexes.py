@@ -0,0 +1,136 @@
+import pytest
+from piccolo.apps.migrations.commands.forwards import run_forwards
+from piccolo.apps.migrations.tables import Migration
+from piccolo.conf.apps import Finder
+from piccolo.querystring import QueryString
+from piccolo.table import drop_db_tables
+from app.models.accounts.tables import City, Country, Region
+from app.models.chat.tables import Chat, Message
+from app.models.feed.tables import Comment, Post, Reaction, Reply
+from app.models.profiles.tables import Friend, Notification
+
+# Statements without a scan to check
+SKIPPED_STATEMENTS = ("INSERT", "EXPLAIN")
+
+
+@pytest.fixture
+async def migrated_db():
+    # The schema as the migrations build it (indexes included), not the table classes
+    await drop_db_tables(*Finder().get_table_classes())
+    response = await run_forwards(app_name="all", migration_id="all", fake=False)
+    assert response.success, response.message
+    yield
+    await Migration.alter().drop_table(if_exists=True)
+
+
+async def seed(user, another_user):
+    # A few rows in every table the routes query
+    country = await Country.objects().create(name="Country", code="CO")
+    region = await Region.objects().create(name="Region", country=country)
+    for index in range(20):
+        await City.objects().create(
+            name=f"City {index}", region=region, country=country
+        )
+        post = await Post.objects().create(author=user, text=f"Post {index}")
+        comment = await Comment.objects().create(author=user, text="C", post=post)
+        reply = await Reply.objects().create(author=user, text="R", comment=comment)
+        await Reaction.objects().create(user=user, rtype="LIKE", post=post)
+        await Reaction.objects().create(user=user, rtype="LOVE", comment=comment)
+        await Reaction.objects().create(user=user, rtype="LIKE", reply=reply)
+        await Notification.create_with_recipients(
+            [another_user.id], sender=user, ntype="REACTION", post=post
+        )
+        chat = await Chat.create_with_members(user, [another_user.id])
+        await Message.objects().create(chat=chat, sender=user, text="Hello")
+        await Friend.objects().create(requester=user, requestee=another_user)
+    await Post._meta.db.run_ddl("ANALYZE")
+    return post, comment, reply, chat
+
+
+async def get_plan(querystring: QueryString) -> str:
+    # With sequential scans disabled, the planner only picks one when no index applies
+    engine = Post._meta.db
+    async with engine.transaction():
+        await engine.run_ddl("SET LOCAL enable_seqscan = off")
+        rows = await engine.run_querystring(QueryString("EXPLAIN {}", querystring))
+    return "\n".join(row["QUERY PLAN"] for row in rows)
+
+
+async def test_route_queries_use_indexes(
+    mocker,
+    migrated_db,
+    authorized_client,
+    verified_user,
+    another_verified_user,
+    another_verified_user_tokens,
+):
+    client, user, another_user = authorized_client, verified_user, another_verified_user
+    another_headers = {
+        "Authorization": f"Bearer {another_verified_user_tokens['access']}"
+    }
+    post, comment, reply, chat = await seed(user, another_user)
+    response = await client.get("/api/v3/feed/posts?page_size=5")
+    cursor = response.json()["data"]["next_cursor"]
+    trigram_search = await City.raw(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+    )
+
+    # (method, path, json, headers) of every route reading from or writing to the db
+    requests = [
+        ("GET", "/feed/posts", None, None),
+        ("GET", f"/feed/posts?cursor={cursor}", None, None),
+        ("GET", f"/feed/posts/{post.slug}", None, None),
+        ("GET", f"/feed/posts/{post.slug}/comments", None, None),
+        ("GET", f"/feed/comments/{comment.slug}", None, None),
+        ("GET", f"/feed/replies/{reply.slug}", None, None),
+        ("GET", f"/feed/reactions/POST/{post.slug}?reaction_type=LIKE", None, None),
+        ("GET", f"/feed/reactions/COMMENT/{comment.slug}", None, None),
+        ("GET", f"/feed/reactions/REPLY/{reply.slug}", None, None),
+        (
+            "POST",
+            f"/feed/reactions/POST/{post.slug}",
+            {"rtype": "LOVE"},
+            another_headers,
+        ),
+        ("GET", "/profiles", None, None),
+        ("GET", "/profiles/cities?name=City", None, None),
+        ("GET", f"/profiles/profile/{user.username}", None, None),
+        ("GET", "/profiles/friends", None, None),
+        ("GET", "/profiles/friends/requests", None, another_headers),
+        (
+            "POST",
+            "/profiles/friends/requests",
+            {"username": another_user.username},
+            None,
+        ),
+        ("GET", "/profiles/notifications", None, another_headers),
+        ("GET", "/profiles/notifications/unread-count", None, another_headers),
+        (
+            "POST",
+            "/profiles/notifications",
+            {"mark_all_as_read": True},
+            another_headers,
+        ),
+        ("GET", "/chats", None, None),
+        ("GET", f"/chats/{chat.id}", None, None),
+        ("POST", "/chats", {"chat_id": str(chat.id), "text": "Hi"}, None),
+    ]
+    engine = Post._meta.db
+    queries = mocker.spy(type(engine), "run_querystring")
+    for method, path, json, headers in requests:
+        queries.reset_mock()
+        response = await client.request(
+            method, f"/api/v3{path}", json=json, headers=headers
+        )
+        assert response.status_code < 400, f"{method} {path}: {response.text}"
+        querystrings = [
+            call.args[1] for call in queries.call_args_list if call.args[0] is engine
+        ]
+        for querystring in querystrings:
+            sql = querystring.compile_string()[0]
+            if sql.lstrip().upper().startswith(SKIPPED_STATEMENTS):
+                continue
+            if "ILIKE" in sql and not trigram_search:
+                continue  # pg_trgm isn't available here
+            plan = await get_plan(querystring)
+            assert "Seq Scan" not in plan, f"{method} {path}:\n{sql}\n{plan}"
@@ -127,6 +127,7 @@ async def test_retrieve_friends(authorized_client, friend, mocker):
             "per_page": 20,
             "current_page": 1,
             "last_page": 1,
+            "last_page_estimated": False,
             "users": [
                 {
                     "first_name": friend.first_name,
@@ -144,6 +145,20 @@ async def test_retrieve_friends(authorized_client, friend, mocker):
         },
     }
 
+    # Test for valid response with a client selected page size
+    response = await authorized_client.get(f"{BASE_URL_PATH}/friends?page_size=5")
+    assert response.status_code == 200
+    assert response.json()["data"]["per_page"] == 5
+
+    # Test for invalid response with a page size above the endpoint's limit
+    response = await authorized_client.get(f"{BASE_URL_PATH}/friends?page_size=51")
+    assert response.status_code == 422
+    assert response.json() == {
+        "status": "failure",
+        "message": "Invalid Entry",
+        "data": {"page_size": "Input should be less than or equal to 50"},
+    }
+
 
 async def test_send_friend_request(authorized_client):
     data = {"username": "invalid_username"}
@@ -207,8 +222,8 @@ async def test_accept_or_reject_friend_request(another_authorized_client, friend
 
 
 async def test_retrieve_notifications(authorized_client, verified_user):
-    notification = await Notification.objects().create(
-        ntype="ADMIN", text="A new update is coming!", receiver_ids=[verified_user.id]
+    notification = await Notification.create_with_recipients(
+        [verified_user.id], ntype="ADMIN", text="A new update is coming!"
     )
 
     # Test for valid response
@@ -218,9 +233,10 @@ async def test_retrieve_notifications(authorized_client, verified_user):
         "status": "success",
         "message": "Notifications fetched",
         "data": {
-            "per_page": 20,
+            "per_page": 50,
             "current_page": 1,
             "last_page": 1,
+            "last_page_estimated": False,
             "notifications": [
                 {
                     "id": str(notification.id),
@@ -238,8 +254,8 @@ async def test_retrieve_notifications(authorized_client, verified_user):
 
 
 async def test_read_notification(authorized_client, verified_user):
-    notification = await Notification.objects().create(
-        ntype="ADMIN", text="A new update is coming!", receiver_ids=[verified_user.id]
+    notification = await Notification.create_with_recipients(
+        [verified_user.id], ntype="ADMIN", text="A new update is coming!"
     )
 
     data = {"id": str(uuid.uuid4()), "mark_all_as_read": False}
@@ -261,3 +277,30 @@ async def test_read_notification(authorized_client, verified_user):
         "status": "success",
         "message": "Notification read",
     }
+
+
+async def test_unread_notifications_count(authorized_client, verified_user):
+    for _ in range(2):
+        await Notification.create_with_recipients(
+            [verified_user.id], ntype="ADMIN", text="A new update is coming!"
+        )
+
+    # Test for valid response
+    url = f"{BASE_URL_PATH}/notifications/unread-count"
+    response = await authorized_client.get(url)
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "success",
+        "message": "Unread notifications count fetched",
+        "data": {"count": 2},
+    }
+
+    # Test that marking all notifications as read resets the count
+    data = {"mark_all_as_read": True}
+    response = await authorized_client.post(f"{BASE_URL_PATH}/notifications", json=data)
+    assert response.status_code == 200
+    response = await authorized_client.get(url)
+    assert response.json()["data"] == {"count": 0}
+    response = await authorized_client.get(f"{BASE_URL_PATH}/notifications")
+    notifications = response.json()["data"]["notifications"]
+    assert [notification["is_read"] for notification in notifications] == [True, True]
@@ -0,0 +1,236 @@
+import asyncio
+import uuid
+import pytest
+from fastapi import WebSocketException
+from app.api.sockets.bus import EventBus, PostgresBroadcastBackend
+from app.api.sockets.chat import ChatSocketManager
+from app.api.sockets.notification import NotificationSocketManager
+
+
+async def test_postgres_broadcast_backend(mocker):
+    worker_a = EventBus(PostgresBroadcastBackend())
+    worker_b = EventBus(PostgresBroadcastBackend())
+    handler_a, handler_b = mocker.AsyncMock(), mocker.AsyncMock()
+    worker_a.subscribe("notifications", handler_a)
+    worker_b.subscribe("notifications", handler_b)
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        # Test that an event published by one worker reaches every worker
+        worker_a.publish("notifications", {"id": "1"})
+        await worker_a.wait_for_deliveries()
+        for _ in range(50):
+            if handler_a.await_count and handler_b.await_count:
+                break
+            await asyncio.sleep(0.05)
+        await worker_b.wait_for_deliveries()
+        handler_a.assert_awaited_once_with({"id": "1"})
+        handler_b.assert_awaited_once_with({"id": "1"})
+
+        # Test that events too large for a NOTIFY reach every worker too, in chunks
+        data = {"id": "é" * 9000, "uuid": uuid.UUID(int=0)}
+        worker_a.publish("notifications", data)
+        for _ in range(50):
+            if handler_a.await_count == 2 and handler_b.await_count == 2:
+                break
+            await asyncio.sleep(0.05)
+        await worker_a.wait_for_deliveries()
+        await worker_b.wait_for_deliveries()
+        expected = {"id": "é" * 9000, "uuid": str(uuid.UUID(int=0))}
+        handler_a.assert_awaited_with(expected)
+        handler_b.assert_awaited_with(expected)
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+
+
+async def test_postgres_broadcast_backend_reconnects(mocker):
+    worker_a = EventBus(PostgresBroadcastBackend(reconnect_interval=0.1))
+    worker_b = EventBus(PostgresBroadcastBackend(reconnect_interval=0.1))
+    handler_a, handler_b = mocker.AsyncMock(), mocker.AsyncMock()
+    worker_a.subscribe("notifications", handler_a)
+    worker_b.subscribe("notifications", handler_b)
+    await worker_a.start()
+    await worker_b.start()
+    backend = worker_b.backend
+    try:
+        # Test that events are still delivered locally while the listener is down
+        connect = mocker.patch("asyncpg.connect", side_effect=OSError("Unreachable"))
+        pid = backend._connection.get_server_pid()
+        await worker_a.backend._connection.execute(
+            "SELECT pg_terminate_backend($1)", pid
+        )
+        for _ in range(50):
+            if connect.called:
+                break
+            await asyncio.sleep(0.05)
+        assert not backend.available
+        worker_b.publish("notifications", {"id": "1"})
+        await worker_b.wait_for_deliveries()
+        handler_b.assert_awaited_once_with({"id": "1"})
+        mocker.stop(connect)
+
+        # Test that delivery between workers resumes once reconnected
+        for _ in range(50):
+            if backend.available:
+                break
+            await asyncio.sleep(0.1)
+        assert backend.available
+        worker_a.publish("notifications", {"id": "2"})
+        for _ in range(50):
+            if handler_b.await_count == 2:
+                break
+            await asyncio.sleep(0.05)
+        await worker_a.wait_for_deliveries()
+        await worker_b.wait_for_deliveries()
+        handler_b.assert_awaited_with({"id": "2"})
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+
+
+async def test_in_memory_broadcast_backend(mocker):
+    worker = EventBus()
+    handler = mocker.AsyncMock()
+    worker.subscribe("notifications", handler)
+    await worker.start()
+
+    # Test that local deliveries get the same JSON data as shared ones
+    worker.publish("notifications", {"id": uuid.UUID(int=0)})
+    await worker.stop()
+    handler.assert_awaited_once_with({"id": str(uuid.UUID(int=0))})
+
+
+async def test_notification_socket_manager_broadcast(
+    mocker, verified_user, another_verified_user
+):
+    manager = NotificationSocketManager()
+    sockets = []
+    for user in (verified_user, verified_user, another_verified_user):
+        websocket = mocker.AsyncMock(scope={"user": user})
+        await manager.connect(websocket)
+        sockets.append(websocket)
+
+    # Test that every socket of the receivers (and only them) gets the data
+    data = {"id": "1", "status": "CREATED"}
+    await manager.broadcast({"receiver_ids": [str(verified_user.id)], "data": data})
+    await manager.wait_for_sends()
+    text = '{"id":"1","status":"CREATED"}'
+    sockets[0].send_text.assert_awaited_once_with(text)
+    sockets[1].send_text.assert_awaited_once_with(text)
+    sockets[2].send_text.assert_not_awaited()
+
+    # Test that closed sockets are dropped from the registry
+    for websocket in sockets:
+        manager.remove_connection(websocket)
+    assert manager.active_connections == {}
+
+
+async def test_chat_socket_manager_broadcast(
+    mocker, chat, group_chat, verified_user, test_user
+):
+    manager = ChatSocketManager()
+    chat_group, other_group = f"chat_{chat.id}", f"chat_{group_chat.id}"
+
+    # Test that non members can't connect
+    websocket = mocker.AsyncMock(scope={"user": test_user, "group_name": chat_group})
+    with pytest.raises(WebSocketException):
+        await manager.connect(websocket, chat.id)
+    assert manager.active_connections == {}
+
+    chat_socket = mocker.AsyncMock(
+        scope={"user": verified_user, "group_name": chat_group}
+    )
+    other_socket = mocker.AsyncMock(
+        scope={"user": verified_user, "group_name": other_group}
+    )
+    await manager.connect(chat_socket, chat.id)
+    await manager.connect(other_socket, group_chat.id)
+
+    # Test that only the sockets of the group get the data
+    data = {"id": "1", "status": "DELETED"}
+    await manager.handle_event({"group_name": chat_group, "data": data})
+    await manager.wait_for_sends()
+    chat_socket.send_text.assert_awaited_once_with('{"id":"1","status":"DELETED"}')
+    other_socket.send_text.assert_not_awaited()
+    manager.remove_connection(chat_socket)
+    manager.remove_connection(other_socket)
+
+
+async def test_slow_socket_consumer_eviction(mocker, verified_user):
+    manager = NotificationSocketManager(send_queue_size=2, send_timeout=0.1)
+
+    async def slow_send(data):
+        await asyncio.Event().wait()  # Never done
+
+    slow_socket = mocker.AsyncMock(scope={"user": verified_user})
+    slow_socket.send_text.side_effect = slow_send
+    socket = mocker.AsyncMock(scope={"user": verified_user})
+    await manager.connect(slow_socket)
+    await manager.connect(socket)
+
+    # Test that a full queue disconnects the slow consumer without holding up the others
+    event = {"receiver_ids": [str(verified_user.id)], "data": {"id": "1"}}
+    for _ in range(4):
+        await manager.broadcast(event)
+        await asyncio.sleep(0.01)
+    await manager.wait_for_sends()
+    assert socket.send_text.await_count == 4
+    assert manager.get_connections(str(verified_user.id)) == [socket]
+    await asyncio.sleep(0)  # Let the slow socket close
+    slow_socket.close.assert_awaited_once()
+    assert manager.stats() == {
+        "connections": 1,
+        "queued_messages": 0,
+        "max_queue_depth": 0,
+        "dropped_messages": 1,
+        "evicted_connections": 1,
+    }
+    manager.remove_connection(socket)
+
+
+async def test_failed_send_releases_pending_waits(mocker, verified_user):
+    manager = NotificationSocketManager(send_queue_size=5, send_timeout=0.1)
+
+    async def slow_send(data):
+        await asyncio.Event().wait()  # Never done
+
+    slow_socket = mocker.AsyncMock(scope={"user": verified_user})
+    slow_socket.send_text.side_effect = slow_send
+    await manager.connect(slow_socket)
+
+    # Test that a send timing out with data still queued doesn't hang waiting callers
+    event = {"receiver_ids": [str(verified_user.id)], "data": {"id": "1"}}
+    for _ in range(3):
+        await manager.broadcast(event)
+    await asyncio.wait_for(manager.wait_for_sends(), 1)
+    assert manager.get_connections(str(verified_user.id)) == []
+    assert manager.stats()["dropped_messages"] == 3
+
+
+async def test_error_data_goes_through_the_send_queue(mocker, verified_user):
+    manager = NotificationSocketManager()
+    sent, sending = [], []
+
+    async def send(data):
+        assert not sending  # One write at a time
+        sending.append(data)
+        await asyncio.sleep(0.01)
+        sent.append(sending.pop())
+
+    socket = mocker.AsyncMock(scope={"user": verified_user})
+    socket.send_text.side_effect = send
+    await manager.connect(socket)
+
+    # Test that error data is sent after the queued data, before disconnecting
+    await manager.broadcast(
+        {"receiver_ids": [str(verified_user.id)], "data": {"id": "1"}}
+    )
+    with pytest.raises(WebSocketException):
+        await manager.send_error_data(socket, "Invalid data")
+    assert sent == [
+        '{"id":"1"}',
+        '{"status":"error","type":"bad_request","code":4000,"message":"Invalid data"}',
+    ]
+    socket.send_json.assert_not_awaited()
+    manager.remove_connection(socket)
@@ -1,14 +1,138 @@
+import asyncio
+import copy
+import hashlib
+import logging
 import random
 import string
 from datetime import datetime, timedelta
+from uuid import UUID, uuid4
 
+import asyncpg
 from jose import jwt
 
+from app.api.utils.cache import TTLCache
 from app.core.config import settings
 from app.models.accounts.tables import User
 
 ALGORITHM = "HS256"
 
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    # Users resolved from access tokens, so that authorization doesn't query the db on every request.
+    # Entries are keyed by a hash of the token and must be invalidated whenever the user's tokens or data change.
+    # With a listener started, invalidations are shared with other workers through postgres NOTIFY. The cache
+    # is then bypassed (and cleared) while the listener is disconnected, since invalidations could be missed.
+    channel = "user_cache_invalidation"
+
+    def __init__(self, max_size: int, ttl: int, reconnect_interval: float = 1):
+        self._users = TTLCache(max_size=max_size, ttl=ttl)
+        self._keys = {}  # user id -> keys of the user's cached tokens
+        self._token_versions = TTLCache(max_size=max_size, ttl=ttl)
+        self.reconnect_interval = reconnect_interval
+        self._db_config = None  # Set once listening
+        self._connection = None
+        self._task: asyncio.Task = None
+
+    @property
+    def available(self) -> bool:
+        if self._db_config is None:  # Not shared
+            return True
+        return self._connection is not None and not self._connection.is_closed()
+
+    def get_key(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        if not self.available:
+            return None
+        user = self._users.get(self.get_key(token))
+        # Every request gets its own copy, since routes modify the user object
+        return copy.deepcopy(user) if user else None
+
+    def set(self, token: str, user: User):
+        if not self.available:
+            return
+        key = self.get_key(token)
+        self._users.set(key, copy.deepcopy(user))
+        keys = {key for key in self._keys.get(user.id, ()) if key in self._users}
+        keys.add(key)
+        self._keys[user.id] = keys
+
+    async def get_token_version(self, user_id: UUID):
+        # The current token version of a user, None if the user doesn't exist
+        version = self._token_versions.get(user_id) if self.available else None
+        if version is None:
+            user = (
+                await User.select(User.token_version).where(User.id == user_id).first()
+            )
+            if not user:
+                return None
+            version = user["token_version"]
+            if self.available:
+                self._token_versions.set(user_id, version)
+        return version
+
+    def evict(self, user_id: UUID):
+        for key in self._keys.pop(user_id, ()):
+            self._users.delete(key)
+        self._token_versions.delete(user_id)
+
+    def clear(self):
+        self._users.clear()
+        self._keys.clear()
+        self._token_versions.clear()
+
+    async def invalidate(self, user_id: UUID):
+        self.evict(user_id)
+        if self._db_config is not None:
+            await User.raw("SELECT pg_notify({}, {})", self.channel, str(user_id))
+
+    async def _connect(self):
+        connection = await asyncpg.connect(**self._db_config)
+        await connection.add_listener(self.channel, self._on_invalidation)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+
+    async def listen(self, db_config: dict):
+        self._db_config = db_config
+        await self._connect()
+
+    def _on_invalidation(self, connection, pid, channel, payload):
+        self.evict(UUID(payload))
+
+    def _on_termination(self, connection):
+        # Entries may be stale once notifications are missed
+        self.clear()
+        if self._db_config is not None and not self._task:
+            self._task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        try:
+            while not self.available:
+                try:
+                    await self._connect()
+                except Exception:
+                    logger.exception("Couldn't reconnect the user cache listener")
+                    await asyncio.sleep(self.reconnect_interval)
+        finally:
+            self._task = None
+
+    async def close(self):
+        self._db_config = None
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._connection:
+            await self._connection.close()
+            self._connection = None
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
 
 class Authentication:
     # generate random string
@@ -20,7 +144,7 @@ class Authentication:
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-        to_encode = {"exp": expire, **payload}
+        to_encode = {"exp": expire, "jti": uuid4().hex, **payload}
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
 
@@ -43,15 +167,63 @@ class Authentication:
             decoded = False
         return decoded
 
+    # generate access token for a user, based on the user's current token version
+    async def create_user_access_token(user: User):
+        return await Authentication.create_access_token(
+            {
+                "user_id": str(user.id),
+                "username": user.username,
+                "ver": user.token_version,
+            }
+        )
+
+    # increment the user's token version (revoking previously issued access tokens) and store new tokens.
+    # The version is incremented by the db, which keeps the row locked until commit, so concurrent
+    # logins and refreshes each get their own version. Returns False when no row matches the filters.
+    async def create_user_tokens(user: User, *filters) -> bool:
+        async with User._meta.db.transaction():
+            response = (
+                await User.update({User.token_version: User.token_version + 1})
+                .where(User.id == user.id, *filters)
+                .returning(User.token_version)
+            )
+            if not response:
+                return False
+            user.token_version = response[0]["token_version"]
+            user.access_token = await Authentication.create_user_access_token(user)
+            user.refresh_token = await Authentication.create_refresh_token()
+            await User.update(
+                {
+                    User.access_token: user.access_token,
+                    User.refresh_token: user.refresh_token,
+                }
+            ).where(User.id == user.id)
+        await user_cache.invalidate(
+            user.id
+        )  # The previous access token is no longer valid
+        return True
+
     async def decodeAuthorization(token: str):
         decoded = await Authentication.decode_jwt(token)
         if not decoded:
             return None
-        user = (
-            await User.objects(
-                User.city, User.city.region, User.city.country, User.avatar
-            )
-            .where(User.id == decoded["user_id"], User.access_token == token)
-            .first()
-        )
+        user_id = UUID(decoded["user_id"])
+        stateless = settings.ACCESS_TOKEN_MODE == "stateless"
+        if stateless:
+            # Revoked tokens are the ones issued before the user's current token version
+            token_version = await user_cache.get_token_version(user_id)
+            if token_version is None or decoded.get("ver") != token_version:
+                return None
+
+        user = user_cache.get(token)
+        if user:
+            return user
+        user = User.objects(
+            User.city, User.city.region, User.city.country, User.avatar
+        ).where(User.id == user_id)
+        if not stateless:
+            user = user.where(User.access_token == token)
+        user = await user.first()
+        if user:
+            user_cache.set(token, user)
         return user
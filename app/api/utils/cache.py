@@ -0,0 +1,41 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    # An in-process LRU cache whose entries also expire after a ttl (in seconds)
+    def __init__(self, max_size: int = 1000, ttl: float = 60) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        item = self._data.get(key)
+        return bool(item) and item[0] > time.monotonic()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if not item:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)  # Recently used
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)  # Least recently used
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
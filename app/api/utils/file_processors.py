@@ -1,55 +1,186 @@
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from app.api.utils.storage import get_public_id, storage
 from app.core.config import settings
-import time
-import cloudinary
-import cloudinary.uploader
-import mimetypes
-
-BASE_FOLDER = "socialnet-v3/"
-
-# FILES CONFIG WITH CLOUDINARY
-cloudinary.config(
-    cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-    api_key=settings.CLOUDINARY_API_KEY,
-    api_secret=settings.CLOUDINARY_API_SECRET,
-)
+import cloudinary.exceptions
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=settings.FILE_URL_CACHE_SIZE)
+def get_cached_file_url(key, folder, content_type):
+    # Memoized, since it's called for every avatar/image/file of a serialized page
+    # and the url only depends on the arguments. Errors propagate, so they're not cached.
+    return storage.generate_file_url(key, folder, content_type)
 
 
 class FileProcessor:
+    # Files go through the configured storage backend (see app.api.utils.storage)
     @staticmethod
     def generate_file_signature(key, folder):
-        key = f"{BASE_FOLDER}{folder}/{key}"
-        timestamp = str(int(time.time()))
-        params = {
-            "public_id": key,
-            "timestamp": timestamp,
-        }
         try:
-            signature = cloudinary.utils.api_sign_request(
-                params_to_sign=params, api_secret=settings.CLOUDINARY_API_SECRET
-            )
-            return {"public_id": key, "signature": signature, "timestamp": timestamp}
+            return storage.generate_file_signature(key, folder)
         except Exception as e:
             print(e)
             pass
 
+    @staticmethod
     def generate_file_url(key, folder, content_type):
-        file_extension = mimetypes.guess_extension(content_type)
-        key = f"{BASE_FOLDER}{folder}/{key}{file_extension}"
-
         try:
-            return cloudinary.utils.cloudinary_url(key, secure=True)[0]
+            return get_cached_file_url(key, folder, content_type)
         except Exception as e:
             print(e)
             pass
 
     def upload_file(file, key, folder):
-        key = f"{BASE_FOLDER}{folder}/{key}"
         try:
-            cloudinary.uploader.upload(file, public_id=key, overwrite=True, faces=True)
+            storage.upload(file, key, folder)
         except Exception as e:
             print(e)
             pass
 
+    @staticmethod
+    async def upload_file_async(file, key, folder, **options) -> "UploadResult":
+        # Doesn't block the event loop, see FileUploader
+        return await file_uploader.upload(file, key, folder, **options)
+
+
+@dataclass
+class UploadResult:
+    key: str
+    success: bool
+    url: str = None
+    attempts: int = 0
+    error: str = None
+
+
+class _KeepOpen(object):
+    # The storage may close the file it uploads, which we still need if a retry follows
+    def __init__(self, file) -> None:
+        self._file = file
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+# Failures worth another try: connection errors, rate limiting and
+# non-JSON (e.g 502/503 from a proxy) responses
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r"^(Socket error|Unexpected error|Error parsing server response \(5\d\d\))"
+)
+
+
+def is_transient_error(exc: Exception) -> bool:
+    if isinstance(
+        exc, (cloudinary.exceptions.RateLimited, cloudinary.exceptions.GeneralError)
+    ):
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return isinstance(exc, cloudinary.exceptions.Error) and bool(
+        TRANSIENT_ERROR_PATTERN.match(str(exc))
+    )
+
+
+class FileUploader(object):
+    # Server-side uploads (imports, admin uploads, migrations...) off the event loop.
+    # File bodies are read and sent in chunks of chunk_size from a thread pool, at most
+    # concurrency uploads run at once and transient failures are retried with an
+    # exponential backoff.
+    def __init__(
+        self,
+        concurrency: int = 4,
+        chunk_size: int = 6000000,
+        max_attempts: int = 3,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._executor: ThreadPoolExecutor = None
+        self._semaphore: asyncio.Semaphore = None
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="file-upload"
+            )
+        return self._executor
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily, so it binds to the running loop
+        if not self._semaphore:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _upload(self, file, key, folder, options: dict) -> dict:
+        # Runs in the pool. file is a path or a file-like object
+        if hasattr(file, "read"):
+            file.seek(0)
+            file = _KeepOpen(file)
+        return storage.upload(file, key, folder, **options)
+
+    async def upload(self, file, key, folder, **options) -> UploadResult:
+        public_id = get_public_id(key, folder)
+        options = {"chunk_size": self.chunk_size, **options}
+        loop = asyncio.get_running_loop()
+        async with self.get_semaphore():
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    response = await loop.run_in_executor(
+                        self.get_executor(),
+                        self._upload,
+                        file,
+                        key,
+                        folder,
+                        dict(options),
+                    )
+                    return UploadResult(
+                        key=public_id,
+                        success=True,
+                        url=response.get("secure_url"),
+                        attempts=attempt,
+                    )
+                except Exception as e:
+                    if attempt == self.max_attempts or not is_transient_error(e):
+                        logger.warning(f"Couldn't upload {public_id}: {e}")
+                        return UploadResult(
+                            key=public_id, success=False, attempts=attempt, error=str(e)
+                        )
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+    async def upload_many(self, files: list[tuple], **options) -> list[UploadResult]:
+        # files is a list of (file, key, folder)
+        return await asyncio.gather(*(self.upload(*args, **options) for args in files))
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+
+file_uploader = FileUploader(
+    concurrency=settings.FILE_UPLOAD_CONCURRENCY,
+    chunk_size=settings.FILE_UPLOAD_CHUNK_SIZE,
+    max_attempts=settings.FILE_UPLOAD_MAX_ATTEMPTS,
+    retry_backoff=settings.FILE_UPLOAD_RETRY_BACKOFF_SECONDS,
+)
+
 
 ALLOWED_IMAGE_TYPES = [
     "image/bmp",
@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from argon2 import PasswordHasher
+
+from app.common.handlers import ErrorCode, RequestError
+from app.core.config import settings
+
+_ph = PasswordHasher()
+
+
+# Module level functions so that they can be pickled and run in worker processes
+def hash_password(password: str) -> str:
+    return _ph.hash(password)
+
+
+def verify_password(hashed_password: str, password: str) -> bool:
+    try:
+        return _ph.verify(hashed_password, password)
+    except Exception:
+        return False
+
+
+class PasswordHasherPool(object):
+    # Runs argon2 hashing and verification off the event loop, in a bounded pool of
+    # threads (argon2 releases the GIL) or processes.
+    # Calls beyond the number of workers wait their turn, and are rejected once
+    # max_queue_size calls are already waiting.
+    def __init__(
+        self, executor: str = "thread", workers: int = 4, max_queue_size: int = 100
+    ) -> None:
+        self.executor_type = executor
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._executor: Executor = None
+        self._semaphore: asyncio.Semaphore = None
+        self.queue_depth = 0  # Calls waiting for a free worker
+        self.running = 0
+
+    def get_executor(self) -> Executor:
+        if not self._executor:
+            executor_class = (
+                ProcessPoolExecutor
+                if self.executor_type == "process"
+                else ThreadPoolExecutor
+            )
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily, so it binds to the running loop
+        if not self._semaphore:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_type,
+            "workers": self.workers,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+        }
+
+    async def run(self, func, *args):
+        if self.queue_depth >= self.max_queue_size:
+            raise RequestError(
+                err_code=ErrorCode.SERVER_ERROR,
+                err_msg="Server is busy, try again later",
+                status_code=503,
+            )
+        self.queue_depth += 1
+        try:
+            await self.get_semaphore().acquire()
+        finally:
+            self.queue_depth -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    async def hash_password(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify_password(self, hashed_password: str, password: str) -> bool:
+        return await self.run(verify_password, hashed_password, password)
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+
+password_hasher = PasswordHasherPool(
+    executor=settings.PASSWORD_HASHER_EXECUTOR,
+    workers=settings.PASSWORD_HASHER_WORKERS,
+    max_queue_size=settings.PASSWORD_HASHER_MAX_QUEUE_SIZE,
+)
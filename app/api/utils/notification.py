@@ -1,6 +1,5 @@
-from app.core.config import settings
 from app.api.schemas.profiles import NotificationSchema
-import websockets, json, os
+from app.api.sockets.bus import bus
 
 
 def get_notification_message(obj):
@@ -9,9 +8,9 @@ def get_notification_message(obj):
     sender = obj.sender.full_name
     message = f"{sender} reacted to your post"
     if ntype == "REACTION":
-        if obj.comment.id:
+        if obj.comment and obj.comment.id:
             message = f"{sender} reacted to your comment"
-        elif obj.reply.id:
+        elif obj.reply and obj.reply.id:
             message = f"{sender} reacted to your reply"
     elif ntype == "COMMENT":
         message = f"{sender} commented on your post"
@@ -20,14 +19,10 @@ def get_notification_message(obj):
     return message
 
 
-# Send notification in websocket
-async def send_notification_in_socket(
-    secured: bool, host: str, notification: object, status: str = "CREATED"
+# Send notification to the notification socket manager(s)
+def send_notification_in_socket(
+    notification: object, receiver_ids: list, status: str = "CREATED"
 ):
-    if os.environ.get("ENVIRONMENT") == "testing":
-        return
-    websocket_scheme = "wss://" if secured else "ws://"
-    uri = f"{websocket_scheme}{host}/api/v3/ws/notifications"
     notification_data = {
         "id": str(notification.id),
         "status": status,
@@ -37,10 +32,8 @@ async def send_notification_in_socket(
         notification_data = notification_data | NotificationSchema.model_validate(
             notification
         ).model_dump(exclude={"id", "ntype"}, by_alias=True)
-    headers = [
-        ("Authorization", settings.SOCKET_SECRET),
-    ]
-    async with websockets.connect(uri, extra_headers=headers) as websocket:
-        # Send a notification to the WebSocket server
-        await websocket.send(json.dumps(notification_data))
-        await websocket.close()
+    # Receivers travel alongside the data, so delivery needs no further queries
+    receiver_ids = [str(getattr(receiver, "id", receiver)) for receiver in receiver_ids]
+    bus.publish(
+        "notifications", {"receiver_ids": receiver_ids, "data": notification_data}
+    )
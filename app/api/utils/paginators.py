@@ -1,23 +1,163 @@
+import asyncio
+import base64
+import hashlib
+import json
 import math
+from datetime import datetime
+from uuid import UUID
+from piccolo.columns import Column
+from piccolo.columns.combination import WhereRaw
+from app.api.utils.cache import TTLCache
 from app.common.handlers import ErrorCode, RequestError
 
 
+def encode_cursor(obj, sort_column: Column, direction: str) -> str:
+    # An opaque token holding the direction and the (sort value, id) pair of the boundary row
+    value = getattr(obj, sort_column._meta.name)
+    payload = json.dumps([direction, value.isoformat(), str(obj.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode()).decode()
+        direction, value, id = json.loads(payload)
+        if direction not in ("next", "prev"):
+            raise ValueError
+        return direction, datetime.fromisoformat(value), UUID(id)
+    except Exception:
+        raise RequestError(
+            err_code=ErrorCode.INVALID_VALUE, err_msg="Invalid cursor", status_code=400
+        )
+
+
+def get_count_query(queryset):
+    # Count with the same filters as the queryset, without the joins, ordering and limits
+    count_query = queryset.table.count()
+    count_query.where_delegate._where = queryset.where_delegate._where
+    return count_query
+
+
+# COUNT STRATEGIES
+# They all return the count and whether it is an estimate or not.
+
+
+class ExactCount(object):
+    async def get_count(self, queryset):
+        return await get_count_query(queryset), False
+
+
+class EstimatedCount(ExactCount):
+    # Uses the planner's row estimate, which is cheap on very large tables.
+    # Exact counts are still used when the estimate falls below the threshold.
+    def __init__(self, threshold: int = 10000) -> None:
+        self.threshold = threshold
+
+    async def get_estimate(self, queryset) -> int:
+        table = queryset.table
+        where = queryset.where_delegate._where
+        if where is None:
+            # Unfiltered, so the table statistics are enough
+            response = await table.raw(
+                "SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = {}::regclass",
+                table._meta.tablename,
+            )
+            return response[0]["estimate"] if response else -1
+
+        query = table.select(table.id)
+        query.where_delegate._where = where
+        response = await table.raw("EXPLAIN (FORMAT JSON) {}", query.querystrings[0])
+        plan = response[0]["QUERY PLAN"]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def get_count(self, queryset):
+        estimate = await self.get_estimate(queryset)
+        if estimate < self.threshold:  # Small set or table never analyzed (-1)
+            return await super().get_count(queryset)
+        return estimate, True
+
+
+class CachedCount(ExactCount):
+    # Caches the count of another strategy, keyed by the fingerprint of the count query.
+    # Cached counts may be behind by up to the ttl, so they're always reported as estimates.
+    _cache = TTLCache(max_size=1000)
+
+    def __init__(self, strategy: ExactCount = None, ttl: int = 60) -> None:
+        self.strategy = strategy or ExactCount()
+        self.ttl = ttl
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    def get_fingerprint(self, queryset) -> str:
+        query = str(get_count_query(queryset))
+        key = f"{self.strategy.__class__.__name__}:{query}"
+        return hashlib.md5(key.encode()).hexdigest()
+
+    async def get_count(self, queryset):
+        fingerprint = self.get_fingerprint(queryset)
+        cached = self._cache.get(fingerprint)
+        if cached is not None:
+            return cached[0], True
+        value = await self.strategy.get_count(queryset)
+        self._cache.set(fingerprint, value, self.ttl)
+        return value
+
+
 class Paginator(object):
-    def __init__(self, page_size: int = 50) -> None:
-        self.page_size = page_size
+    def __init__(self, page_size: int = 50, count_strategy: ExactCount = None) -> None:
+        self._page_size = page_size
+        self._count_strategy = count_strategy or ExactCount()
+
+    @property
+    def page_size(self) -> int:
+        # Read only, a paginator is created per request with its own page size
+        return self._page_size
+
+    async def get_items_and_count(self, queryset, current_page):
+        page_size = self.page_size
+        offset = (current_page - 1) * page_size
+        if isinstance(queryset, list):
+            # Already evaluated data (e.g an empty list when there's nothing to query)
+            return queryset[offset : offset + page_size], len(queryset), False
+
+        # Let the database do the slicing and counting
+        items, (qs_count, estimated) = await asyncio.gather(
+            queryset.limit(page_size).offset(offset),
+            self._count_strategy.get_count(queryset),
+        )
+        return items, qs_count, estimated
+
+    async def paginate_queryset(
+        self,
+        queryset,
+        current_page,
+        cursor: str = None,
+        order_by: Column = None,
+        ascending: bool = True,
+    ):
+        # order_by is the sort key (e.g Post.created_at), the id is always used as a tiebreaker
+        # so that the ordering is stable and can be used for cursors.
+        if cursor and order_by:
+            return await self.paginate_queryset_by_cursor(
+                queryset, cursor, order_by, ascending
+            )
 
-    async def paginate_queryset(self, queryset, current_page):
         if current_page < 1:
             raise RequestError(
                 err_code=ErrorCode.INVALID_PAGE, err_msg="Invalid Page", status_code=404
             )
         page_size = self.page_size
-        # Doing limit and offset would probably be the best way for this, but this ORM left me no choice.
-        qs = []
-        if queryset != qs:
-            qs = await queryset.limit(1000000)
-        items = qs[(current_page - 1) * page_size : current_page * page_size]
-        qs_count = len(qs)
+        if order_by:
+            queryset = queryset.order_by(
+                order_by, queryset.table.id, ascending=ascending
+            )
+        items, qs_count, estimated = await self.get_items_and_count(
+            queryset, current_page
+        )
 
         if qs_count > 0 and not items:
             raise RequestError(
@@ -28,9 +168,72 @@ class Paginator(object):
 
         last_page = math.ceil(qs_count / page_size)
         last_page = 1 if last_page == 0 else last_page
-        return {
+        if estimated and items:
+            # An estimate (or a cached count) can fall behind the real data
+            last_page = max(last_page, current_page)
+        data = {
             "items": items,
             "per_page": page_size,
             "current_page": current_page,
             "last_page": last_page,
+            "last_page_estimated": estimated,
+        }
+        if order_by:
+            # Allow clients to continue with cursors from any page
+            has_next = current_page < last_page or (
+                estimated and len(items) == page_size
+            )
+            data["next_cursor"] = (
+                encode_cursor(items[-1], order_by, "next") if has_next else None
+            )
+            data["prev_cursor"] = (
+                encode_cursor(items[0], order_by, "prev")
+                if current_page > 1 and items
+                else None
+            )
+        return data
+
+    async def paginate_queryset_by_cursor(
+        self, queryset, cursor: str, order_by: Column, ascending: bool = True
+    ):
+        page_size = self.page_size
+        direction, value, id = decode_cursor(cursor)
+        forward = direction == "next"
+
+        # Going backwards means seeking in the opposite order and flipping the rows afterwards
+        seek_ascending = ascending if forward else not ascending
+        table = queryset.table
+        tablename = table._meta.tablename
+        sort_column_name = order_by._meta.db_column_name
+        operator = ">" if seek_ascending else "<"
+        queryset = (
+            queryset.where(
+                WhereRaw(
+                    f'("{tablename}"."{sort_column_name}", "{tablename}"."id") {operator} ({{}}, {{}})',
+                    value,
+                    id,
+                )
+            )
+            .order_by(order_by, table.id, ascending=seek_ascending)
+            .limit(page_size + 1)  # One extra row tells if there's more
+        )
+        items = await queryset
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if not forward:
+            items.reverse()
+
+        next_cursor = prev_cursor = None
+        if items:
+            if not forward or has_more:
+                next_cursor = encode_cursor(items[-1], order_by, "next")
+            if forward or has_more:
+                prev_cursor = encode_cursor(items[0], order_by, "prev")
+        return {
+            "items": items,
+            "per_page": page_size,
+            "current_page": None,
+            "last_page": None,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
         }
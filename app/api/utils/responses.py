@@ -0,0 +1,80 @@
+import asyncio
+import os
+from functools import wraps
+from fastapi import Response
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+
+def schema_response(
+    schema: type[BaseModel], content, status_code: int = 200
+) -> Response:
+    # Validates the content (e.g dicts holding our piccolo objects) once and lets
+    # pydantic-core write the JSON directly, instead of FastAPI validating, dumping to
+    # python objects and then encoding them again.
+    data = schema.model_validate(content, from_attributes=True)
+    return Response(
+        data.model_dump_json(by_alias=True),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+class SchemaResponseRoute(APIRoute):
+    # Serializes what endpoints return with schema_response, using the route's response model
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        schema, endpoint = self.response_model, self.dependant.call
+        if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+            return
+        if not asyncio.iscoroutinefunction(endpoint):
+            return  # The request handler was built for a sync endpoint
+        status_code = self.status_code or 200
+
+        @wraps(endpoint)
+        async def serialized_endpoint(*args, **kwargs):
+            content = await endpoint(*args, **kwargs)
+            if isinstance(content, Response):
+                return content
+            return schema_response(schema, content, status_code)
+
+        self.dependant.call = serialized_endpoint
+
+
+class SendfileResponse(FileResponse):
+    # Hands the file to the server when it supports the ASGI pathsend or zerocopysend
+    # extensions (sent with sendfile, without copying it through python), otherwise
+    # streams it in chunks like FileResponse.
+    async def __call__(self, scope, receive, send) -> None:
+        extensions = scope.get("extensions") or {}
+        zero_copy = "http.response.zerocopysend" in extensions
+        if self.send_header_only or not (
+            zero_copy or "http.response.pathsend" in extensions
+        ):
+            return await super().__call__(scope, receive, send)
+
+        if self.stat_result is None:
+            self.stat_result = os.stat(self.path)
+            self.set_stat_headers(self.stat_result)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if zero_copy:
+            file = open(self.path, "rb")
+            try:
+                await send({"type": "http.response.zerocopysend", "file": file})
+                # The server may still be sending from the file when send returns. Once the
+                # response is complete, receive gives http.disconnect and the file can be closed
+                while (await receive())["type"] != "http.disconnect":
+                    pass
+            finally:
+                file.close()
+        else:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        if self.background is not None:
+            await self.background()
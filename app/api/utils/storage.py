@@ -0,0 +1,139 @@
+import hashlib
+import hmac
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+import cloudinary.utils
+
+from app.core.config import settings
+
+BASE_FOLDER = "socialnet-v3/"
+
+
+def get_public_id(key, folder) -> str:
+    return f"{BASE_FOLDER}{folder}/{key}"
+
+
+# STORAGE BACKENDS
+# Where file bodies live. Clients upload with the signature generated for a file and
+# everyone fetches it from the generated url.
+
+
+class CloudinaryStorage:
+    def __init__(self) -> None:
+        cloudinary.config(
+            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+            api_key=settings.CLOUDINARY_API_KEY,
+            api_secret=settings.CLOUDINARY_API_SECRET,
+        )
+
+    def generate_file_signature(self, key, folder) -> dict:
+        public_id = get_public_id(key, folder)
+        timestamp = str(int(time.time()))
+        params = {"public_id": public_id, "timestamp": timestamp}
+        signature = cloudinary.utils.api_sign_request(
+            params_to_sign=params, api_secret=settings.CLOUDINARY_API_SECRET
+        )
+        return {"public_id": public_id, "signature": signature, "timestamp": timestamp}
+
+    def generate_file_url(self, key, folder, content_type) -> str:
+        file_extension = mimetypes.guess_extension(content_type)
+        public_id = get_public_id(key, folder)
+        return cloudinary.utils.cloudinary_url(
+            f"{public_id}{file_extension}", secure=True
+        )[0]
+
+    def upload(self, file, key, folder, **options) -> dict:
+        # Sent in chunks of chunk_size (a request each)
+        options = {
+            "public_id": get_public_id(key, folder),
+            "overwrite": True,
+            "faces": True,
+            "resource_type": "auto",
+            **options,
+        }
+        return cloudinary.uploader.upload_large(file, **options)
+
+
+class LocalStorage:
+    # Files are kept under root (by public id, without extension) and served by the
+    # media routes, so the whole stack runs without any outside service.
+    signature_max_age = 3600  # Seconds
+
+    def __init__(self, root: str = None, base_url: str = None) -> None:
+        self.root = Path(root or settings.MEDIA_ROOT).resolve()
+        self.base_url = (base_url or settings.MEDIA_URL).rstrip("/")
+
+    def get_path(self, public_id: str) -> Path:
+        path = (self.root / public_id).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Invalid public id: {public_id}")
+        return path
+
+    def sign(self, public_id: str, timestamp: str) -> str:
+        message = f"public_id={public_id}&timestamp={timestamp}".encode()
+        return hmac.new(
+            settings.SECRET_KEY.encode(), message, hashlib.sha256
+        ).hexdigest()
+
+    def verify_signature(self, public_id: str, timestamp: str, signature: str) -> bool:
+        if not timestamp.isdigit():
+            return False
+        if time.time() - int(timestamp) > self.signature_max_age:
+            return False
+        return hmac.compare_digest(self.sign(public_id, timestamp), signature)
+
+    def generate_file_signature(self, key, folder) -> dict:
+        public_id = get_public_id(key, folder)
+        timestamp = str(int(time.time()))
+        signature = self.sign(public_id, timestamp)
+        return {"public_id": public_id, "signature": signature, "timestamp": timestamp}
+
+    def generate_file_url(self, key, folder, content_type) -> str:
+        file_extension = mimetypes.guess_extension(content_type)
+        return f"{self.base_url}/{get_public_id(key, folder)}{file_extension}"
+
+    def open_temporary_file(self, public_id: str) -> t.IO[bytes]:
+        # Written next to the final path and moved in place once complete
+        path = self.get_path(public_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=path.parent, delete=False)
+
+    def save_temporary_file(self, public_id: str, temporary_file: t.IO[bytes]):
+        temporary_file.close()
+        os.replace(temporary_file.name, self.get_path(public_id))
+
+    def upload(self, file, key, folder, **options) -> dict:
+        public_id = get_public_id(key, folder)
+        chunk_size = options.get("chunk_size", 1024 * 1024)
+        temporary_file = self.open_temporary_file(public_id)
+        try:
+            if hasattr(file, "read"):
+                shutil.copyfileobj(file, temporary_file, chunk_size)
+            else:
+                with open(file, "rb") as source:
+                    shutil.copyfileobj(source, temporary_file, chunk_size)
+            self.save_temporary_file(public_id, temporary_file)
+        except Exception:
+            temporary_file.close()
+            os.unlink(temporary_file.name)
+            raise
+        return {
+            "public_id": public_id,
+            "bytes": self.get_path(public_id).stat().st_size,
+        }
+
+
+STORAGE_BACKENDS = {
+    "cloudinary": CloudinaryStorage,
+    "local": LocalStorage,
+}
+
+storage = STORAGE_BACKENDS[settings.FILE_STORAGE_BACKEND]()
@@ -1,9 +1,9 @@
 from piccolo_admin.endpoints import TableConfig
 from app.models.general.tables import SiteDetail
 from app.models.accounts.tables import City, Country, Region, User
-from app.models.chat.tables import Chat, Message
+from app.models.chat.tables import Chat, ChatMember, Message
 from app.models.feed.tables import Comment, Post, Reaction, Reply
-from app.models.profiles.tables import Friend, Notification
+from app.models.profiles.tables import Friend, Notification, NotificationRecipient
 
 # PROFILES
 profiles = "Profiles"
@@ -77,6 +77,20 @@ notification_config = TableConfig(
     visible_filters=notification_visible_columns,
     menu_group=profiles,
 )
+
+notification_recipient_visible_columns = [
+    NotificationRecipient.id,
+    NotificationRecipient.notification,
+    NotificationRecipient.user,
+    NotificationRecipient.read_at,
+    NotificationRecipient.created_at,
+]
+notification_recipient_config = TableConfig(
+    NotificationRecipient,
+    visible_columns=notification_recipient_visible_columns,
+    visible_filters=notification_recipient_visible_columns,
+    menu_group=profiles,
+)
 # ----------------------------------------------------
 
 # CHAT
@@ -96,6 +110,19 @@ chat_config = TableConfig(
     menu_group=chats,
 )
 
+chat_member_visible_columns = [
+    ChatMember.id,
+    ChatMember.chat,
+    ChatMember.user,
+    ChatMember.created_at,
+]
+chat_member_config = TableConfig(
+    ChatMember,
+    visible_columns=chat_member_visible_columns,
+    visible_filters=chat_member_visible_columns,
+    menu_group=chats,
+)
+
 message_visible_columns = [
     Message.id,
     Message.chat,
@@ -165,7 +192,9 @@ ALL_TABLE_CLASSES = [
     city_config,
     friend_config,
     notification_config,
+    notification_recipient_config,
     chat_config,
+    chat_member_config,
     message_config,
     reaction_config,
     post_config,
@@ -21,6 +21,41 @@ class Settings(BaseSettings):
     # SECURITY
     SECRET_KEY: str
     SOCKET_SECRET: str
+    # Bearer token for /api/v3/metrics (pool, replica and hasher internals), not served when unset
+    METRICS_TOKEN: Optional[str] = None
+
+    # stateful: access tokens must match the one stored for the user (a db lookup per request)
+    # stateless: access tokens are verified by signature, expiry and the user's (cached) token version
+    ACCESS_TOKEN_MODE: Literal["stateful", "stateless"] = "stateful"
+
+    # AUTHENTICATED USERS CACHE
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+    # Share invalidations between workers (postgres LISTEN/NOTIFY), always on with more than one worker
+    USER_CACHE_SHARED: bool = False
+    # Server worker processes (the variable uvicorn and gunicorn read)
+    WEB_CONCURRENCY: int = 1
+
+    # PASSWORD HASHING (argon2 runs in a pool, off the event loop)
+    PASSWORD_HASHER_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHER_WORKERS: int = 4
+    # Hashing calls allowed to wait for a worker before new ones are rejected (503)
+    PASSWORD_HASHER_MAX_QUEUE_SIZE: int = 100
+
+    # FEED COUNTERS
+    # Buffer reactions/comments/replies counts and flush them in batches
+    # (repair drift with `piccolo feed reconcile_counts`)
+    COUNTER_BUFFER_ENABLED: bool = False
+    COUNTER_BUFFER_FLUSH_INTERVAL_MS: int = 500
+    COUNTER_BUFFER_MAX_DELTAS: int = 1000
+
+    # SOCKETS
+    # memory: events only reach sockets connected to the same worker
+    # postgres: events reach every worker and node (postgres LISTEN/NOTIFY)
+    SOCKET_BROADCAST_BACKEND: Literal["memory", "postgres"] = "memory"
+    # Sockets with more pending messages, or slower sends, are disconnected
+    SOCKET_SEND_QUEUE_SIZE: int = 100
+    SOCKET_SEND_TIMEOUT_SECONDS: float = 5
 
     # PROJECT DETAILS
     PROJECT_NAME: str
@@ -35,6 +70,23 @@ class Settings(BaseSettings):
     POSTGRES_SERVER: str
     POSTGRES_PORT: str
     POSTGRES_DB: str
+    # Connection pool (per worker, so workers * max size must fit in max_connections)
+    POSTGRES_POOL_MIN_SIZE: int = 10
+    POSTGRES_POOL_MAX_SIZE: int = 10
+    # Queries a connection runs before it's replaced (0 to disable)
+    POSTGRES_POOL_MAX_QUERIES: int = 50000
+    # Seconds before idle connections are closed (0 to disable)
+    POSTGRES_POOL_MAX_INACTIVE_CONNECTION_LIFETIME: float = 300
+    # Prepared statements cached per connection (0 behind pgbouncer's transaction mode)
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 100
+    # Read replica (optional, same credentials and database). Reads of GET requests go
+    # to it while its lag is under POSTGRES_REPLICA_MAX_LAG_SECONDS, and clients keep
+    # reading from the primary for POSTGRES_READ_YOUR_WRITES_SECONDS after a write.
+    POSTGRES_REPLICA_SERVER: Optional[str] = None
+    POSTGRES_REPLICA_PORT: Optional[str] = None  # Defaults to POSTGRES_PORT
+    POSTGRES_REPLICA_MAX_LAG_SECONDS: float = 5
+    POSTGRES_REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 1
+    POSTGRES_READ_YOUR_WRITES_SECONDS: float = 5
 
     # FIRST SUPERUSER
     FIRST_SUPERUSER_EMAIL: EmailStr
@@ -60,6 +112,18 @@ class Settings(BaseSettings):
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
+    # Where files are stored. local keeps them under MEDIA_ROOT and serves them from
+    # the /media routes (MEDIA_URL being their public address), e.g for offline runs
+    FILE_STORAGE_BACKEND: Literal["cloudinary", "local"] = "cloudinary"
+    MEDIA_ROOT: str = str(PROJECT_DIR / "media")
+    MEDIA_URL: str = "/media"
+    # Generated file urls kept in memory
+    FILE_URL_CACHE_SIZE: int = 10000
+    # Server-side uploads (see FileUploader)
+    FILE_UPLOAD_CONCURRENCY: int = 4
+    FILE_UPLOAD_CHUNK_SIZE: int = 6000000  # Bytes per request
+    FILE_UPLOAD_MAX_ATTEMPTS: int = 3
+    FILE_UPLOAD_RETRY_BACKOFF_SECONDS: float = 0.5
 
     @validator("CORS_ALLOWED_ORIGINS", "ALLOWED_HOSTS", pre=True)
     def assemble_cors_origins(cls, v):
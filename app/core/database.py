@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import re
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+
+from piccolo.engine.postgres import PostgresEngine
+from piccolo.querystring import QueryString
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+READ_STATEMENT = re.compile(r"\s*(SELECT|WITH|EXPLAIN|SHOW|VALUES|TABLE)\b", re.I)
+# Anything in a read statement that writes, locks or depends on the session
+WRITE_PATTERN = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|ANALYZE|SHARE|nextval|setval|currval|lastval"
+    r"|pg_notify|set_config|pg_\w*advisory\w*)\b",
+    re.I,
+)
+
+
+def is_read_statement(sql: str) -> bool:
+    # Whether the statement only reads, so that it can run on the replica
+    return bool(READ_STATEMENT.match(sql)) and not WRITE_PATTERN.search(sql)
+
+
+class ReplicaRouting(object):
+    # The state of a request routed by ReadReplicaMiddleware, updated by the engine
+    def __init__(self, allowed: bool) -> None:
+        self.allowed = allowed  # Whether reads may go to the replica
+        self.wrote = False
+
+
+replica_routing: ContextVar[ReplicaRouting] = ContextVar(
+    "replica_routing", default=None
+)
+
+
+class PoolMetrics(object):
+    def __init__(self) -> None:
+        self.acquisitions = 0
+        self.in_use = 0
+        self.waiting = 0  # Acquisitions waiting for a connection
+        self.saturation_events = 0  # Acquisitions that found every connection in use
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, wait: float):
+        self.acquisitions += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def stats(self) -> dict:
+        average_wait = self.total_wait / self.acquisitions if self.acquisitions else 0
+        return {
+            "acquisitions": self.acquisitions,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "saturation_events": self.saturation_events,
+            "average_wait_ms": round(average_wait * 1000, 3),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class _AcquireContext(object):
+    def __init__(self, pool: "InstrumentedPool", timeout) -> None:
+        self.pool = pool
+        self.timeout = timeout
+        self.connection = None
+
+    async def __aenter__(self):
+        self.connection = await self.pool._acquire(self.timeout)
+        return self.connection
+
+    async def __aexit__(self, *args):
+        connection, self.connection = self.connection, None
+        await self.pool.release(connection)
+
+    def __await__(self):
+        return self.pool._acquire(self.timeout).__await__()
+
+
+class InstrumentedPool(object):
+    # Wraps the asyncpg pool (used the same way by piccolo) to measure how long
+    # queries wait for a connection
+    def __init__(self, pool) -> None:
+        self._pool = pool
+        self.metrics = PoolMetrics()
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    def acquire(self, *, timeout=None) -> _AcquireContext:
+        # Like asyncpg, usable with both "await" and "async with"
+        return _AcquireContext(self, timeout)
+
+    async def _acquire(self, timeout=None):
+        pool, metrics = self._pool, self.metrics
+        if pool.get_idle_size() == 0 and pool.get_size() >= pool.get_max_size():
+            metrics.saturation_events += 1
+        metrics.waiting += 1
+        start = time.perf_counter()
+        try:
+            connection = await pool.acquire(timeout=timeout)
+        finally:
+            metrics.waiting -= 1
+        metrics.record_wait(time.perf_counter() - start)
+        metrics.in_use += 1
+        return connection
+
+    async def release(self, connection, *, timeout=None):
+        self.metrics.in_use -= 1
+        await self._pool.release(connection, timeout=timeout)
+
+    def stats(self) -> dict:
+        pool = self._pool
+        return {
+            "size": pool.get_size(),
+            "idle": pool.get_idle_size(),
+            "min_size": pool.get_min_size(),
+            "max_size": pool.get_max_size(),
+            **self.metrics.stats(),
+        }
+
+
+class ReplicaLagGuard(object):
+    # Checks the replica's lag every check_interval seconds. Reads fall back to the
+    # primary while it's over max_lag or the replica can't be reached.
+    lag_query = (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+        "END AS lag"
+    )
+
+    def __init__(self, replica, max_lag: float = 5, check_interval: float = 1) -> None:
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: float = None  # Seconds, None when unknown
+        self._task: asyncio.Task = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def check(self):
+        try:
+            response = await self.replica.run_querystring(QueryString(self.lag_query))
+            self.lag = float(response[0]["lag"] or 0)
+        except Exception:
+            logger.exception("Couldn't check the replica's lag")
+            self.lag = None
+        if not self.healthy:
+            logger.warning(f"Reading from the primary, replica lag: {self.lag}")
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+class InstrumentedPostgresEngine(PostgresEngine):
+    # A PostgresEngine whose pool is created with pool_options (e.g min_size, max_size)
+    # and instrumented.
+    # With a replica, the reads (SELECTs outside transactions) of requests routed by
+    # ReadReplicaMiddleware run on it while the ReplicaLagGuard allows it.
+    def __init__(
+        self,
+        *args,
+        pool_options: dict = None,
+        replica: PostgresEngine = None,
+        max_replica_lag: float = 5,
+        replica_lag_check_interval: float = 1,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.pool_options = pool_options or {}
+        self.replica = replica
+        self.replica_guard = None
+        if replica:
+            self.extra_nodes = {**self.extra_nodes, "replica": replica}
+            self.replica_guard = ReplicaLagGuard(
+                replica,
+                max_lag=max_replica_lag,
+                check_interval=replica_lag_check_interval,
+            )
+
+    async def start_connection_pool(self, **kwargs) -> None:
+        await super().start_connection_pool(**{**self.pool_options, **kwargs})
+        if self.pool and not isinstance(self.pool, InstrumentedPool):
+            self.pool = InstrumentedPool(self.pool)
+        if self.replica:
+            await self.replica.start_connection_pool(**kwargs)
+            self.replica_guard.start()
+
+    async def close_connection_pool(self) -> None:
+        if self.replica:
+            self.replica_guard.stop()
+            await self.replica.close_connection_pool()
+        await super().close_connection_pool()
+
+    def pool_stats(self) -> dict:
+        return self.pool.stats() if self.pool else None
+
+    def replica_stats(self) -> dict:
+        if not self.replica:
+            return None
+        return {
+            "lag_seconds": self.replica_guard.lag,
+            "healthy": self.replica_guard.healthy,
+            "pool": self.replica.pool_stats()
+            if isinstance(self.replica, InstrumentedPostgresEngine)
+            else None,
+        }
+
+    async def run_querystring(self, querystring: QueryString, in_pool: bool = True):
+        routing = replica_routing.get()
+        if self.replica and routing:
+            sql = querystring.compile_string(engine_type=self.engine_type)[0]
+            if not is_read_statement(sql):
+                # A write, the request's next reads (and the client's) must see it
+                routing.allowed = False
+                routing.wrote = True
+            elif (
+                routing.allowed
+                and self.replica_guard.healthy
+                and not self.current_transaction.get()
+            ):
+                return await self.replica.run_querystring(querystring, in_pool)
+        return await super().run_querystring(querystring, in_pool)
+
+
+class ReadReplicaMiddleware(object):
+    # Lets the reads of GET/HEAD requests go to the replica, except for clients that
+    # wrote in the last read_your_writes seconds. Responses to requests that wrote carry
+    # the write time in a cookie and a header, which clients send back (either one), so
+    # it works whatever the worker or node serving the next request.
+    marker_name = "last-write"
+    marker_header = "x-last-write"
+
+    def __init__(self, app, read_your_writes: float = 5):
+        self.app = app
+        self.read_your_writes = read_your_writes
+
+    def get_last_write(self, scope) -> float:
+        headers = Headers(scope=scope)
+        cookies = SimpleCookie(headers.get("cookie", ""))
+        value = headers.get(self.marker_header) or (
+            cookies[self.marker_name].value if self.marker_name in cookies else ""
+        )
+        try:
+            return float(value)
+        except ValueError:
+            return 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        recently_wrote = (
+            time.time() - self.get_last_write(scope) < self.read_your_writes
+        )
+        routing = ReplicaRouting(
+            allowed=scope["method"] in ("GET", "HEAD") and not recently_wrote
+        )
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start" and routing.wrote:
+                value = f"{time.time():.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append(self.marker_header, value)
+                max_age = int(self.read_your_writes) + 1
+                headers.append(
+                    "set-cookie",
+                    f"{self.marker_name}={value}; Max-Age={max_age}; Path=/; "
+                    "HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        token = replica_routing.set(routing)
+        try:
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            replica_routing.reset(token)
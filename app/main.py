@@ -1,16 +1,28 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from fastapi.routing import Mount
 from piccolo.engine import engine_finder
 from piccolo_admin.endpoints import create_admin
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.deps import verify_metrics_token
 from app.api.routers import main_router
-from app.api.sockets.notification import notification_socket_router
-from app.api.sockets.chat import chat_socket_router
+from app.api.routes import media
+from app.api.sockets.bus import bus
+from app.api.utils.auth import user_cache
+from app.api.utils.file_processors import file_uploader
+from app.api.utils.hashers import password_hasher
+from app.api.sockets.notification import (
+    manager as notification_manager,
+    notification_socket_router,
+)
+from app.api.sockets.chat import chat_socket_router, manager as chat_manager
 from app.common.handlers import exc_handlers
 from app.core.admin import ALL_TABLE_CLASSES
 from app.core.config import settings
+from app.core.database import InstrumentedPostgresEngine, ReadReplicaMiddleware
+from app.models.feed.utils import counter_buffer
 
 
 @asynccontextmanager
@@ -18,7 +30,18 @@ async def lifespan(app: FastAPI):
     # Open Database connection pool
     engine = engine_finder()
     await engine.start_connection_pool()
+    if settings.USER_CACHE_SHARED or settings.WEB_CONCURRENCY > 1:
+        # Otherwise other workers keep serving revoked tokens' users until the ttl
+        await user_cache.listen(engine.config)
+    if settings.COUNTER_BUFFER_ENABLED:
+        counter_buffer.start()
+    await bus.start()
     yield
+    await bus.stop()
+    await counter_buffer.stop()
+    await user_cache.close()
+    password_hasher.shutdown()
+    file_uploader.shutdown()
     # Close Database connection pool
     await engine.close_connection_pool()
 
@@ -42,7 +65,8 @@ app = FastAPI(
                 * Requires authorization, so pass in the Bearer Authorization header.
                 * Use chat_id as the ID for existing chat or username if its the first message in a DM.
                 * You cannot read realtime messages from a username that doesn't belong to the authorized user, but you can surely send messages
-                * Only send message to the socket endpoint after the message has been created or updated, and files has been uploaded.
+                * Messages created, updated or deleted through the REST endpoints are sent to the socket automatically.
+                * You can still resend a message to the socket endpoint (e.g after its file has been uploaded).
                 * Fields when sending message through the socket: e.g {"status": "CREATED", "id": "fe4e0235-80fc-4c94-b15e-3da63226f8ab"}
                     * status - This must be either CREATED or UPDATED (string type)
                     * id - This is the ID of the message (uuid type)
@@ -50,6 +74,7 @@ app = FastAPI(
     openapi_url=f"/openapi.json",
     docs_url="/",
     security=[{"BearerToken": []}],
+    default_response_class=ORJSONResponse,
     exception_handlers=exc_handlers,
     lifespan=lifespan,
     routes=[Mount("/admin/", admin)],
@@ -70,10 +95,19 @@ app.add_middleware(
         "accept-encoding",
         "access-control-allow-origin",
         "content-disposition",
+        "x-last-write",
     ],
+    expose_headers=["x-last-write"],  # See ReadReplicaMiddleware
 )
 
+if settings.POSTGRES_REPLICA_SERVER:
+    app.add_middleware(
+        ReadReplicaMiddleware,
+        read_your_writes=settings.POSTGRES_READ_YOUR_WRITES_SECONDS,
+    )
+
 app.include_router(main_router, prefix="/api/v3")
+app.include_router(media.router, prefix="/media", tags=["Media"])
 app.add_websocket_route("/api/v3/ws/notifications", notification_socket_router)
 app.add_websocket_route("/api/v3/ws/chats/{chat_id}", chat_socket_router)
 
@@ -81,3 +115,32 @@ app.add_websocket_route("/api/v3/ws/chats/{chat_id}", chat_socket_router)
 @app.get("/api/v3/healthcheck", name="Healthcheck", tags=["Healthcheck"])
 async def healthcheck():
     return {"success": "pong!"}
+
+
+@app.get(
+    "/api/v3/metrics",
+    name="Metrics",
+    tags=["Healthcheck"],
+    dependencies=[Depends(verify_metrics_token)],
+    include_in_schema=False,
+)
+async def metrics():
+    # Pool usage of this worker, e.g to size the workers against max_connections
+    engine = engine_finder()
+    return {
+        "database_pool": (
+            engine.pool_stats()
+            if isinstance(engine, InstrumentedPostgresEngine)
+            else None
+        ),
+        "database_replica": (
+            engine.replica_stats()
+            if isinstance(engine, InstrumentedPostgresEngine)
+            else None
+        ),
+        "password_hasher": password_hasher.stats(),
+        "sockets": {
+            "notifications": notification_manager.stats(),
+            "chats": chat_manager.stats(),
+        },
+    }
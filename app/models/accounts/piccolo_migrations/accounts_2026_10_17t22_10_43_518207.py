@@ -0,0 +1,68 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.columns.column_types import Varchar
+from piccolo.table import Table
+from piccolo.utils.warnings import colored_warning
+
+
+class City(Table, tablename="city", schema=None):
+    pass
+
+
+class User(Table, tablename="base_user", schema=None):
+    pass
+
+
+ID = "2026-10-17T22:10:43:518207"
+VERSION = "1.2.0"
+DESCRIPTION = "Route query indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="accounts", description=DESCRIPTION
+    )
+
+    # Profiles, friend requests and direct messages look users up by username
+    manager.alter_column(
+        table_class_name="User",
+        tablename="base_user",
+        column_name="username",
+        db_column_name="username",
+        params={"index": True},
+        old_params={"index": False},
+        column_class=Varchar,
+        old_column_class=Varchar,
+        schema=None,
+    )
+
+    # Piccolo has no provision for composite or trigram indexes, so raw sql is used here.
+    # Users are listed newest first. Cities are searched by any part of their name
+    # (ILIKE '%name%'), which only a trigram index serves. pg_trgm ships with postgres'
+    # contrib modules, without it the search keeps scanning the table.
+    async def run():
+        await User.raw(
+            "CREATE INDEX IF NOT EXISTS base_user_created_at_id ON base_user (created_at, id)"
+        )
+        available = await City.raw(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if not available:
+            colored_warning(
+                "pg_trgm isn't available, the city_name_trgm index is skipped and city "
+                "names are searched without an index. Install postgres' contrib modules "
+                "and run this migration backwards then forwards to add it."
+            )
+            return
+        await City.raw("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        await City.raw(
+            "CREATE INDEX IF NOT EXISTS city_name_trgm ON city USING GIN (name gin_trgm_ops)"
+        )
+
+    async def run_backwards():
+        await User.raw("DROP INDEX IF EXISTS base_user_created_at_id")
+        await City.raw("DROP INDEX IF EXISTS city_name_trgm")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
@@ -2,6 +2,7 @@ from uuid import UUID
 
 from slugify import slugify
 from app.api.utils.file_processors import FileProcessor
+from app.api.utils.hashers import password_hasher
 from app.api.utils.utils import generate_random_alphanumeric_string
 from app.core.config import settings
 from app.models.base.tables import BaseModel, File
@@ -15,6 +16,7 @@ from piccolo.columns import (
     Date,
     Secret,
     BigInt,
+    Integer,
 )
 from piccolo.utils.sync import run_sync
 from piccolo.columns.readable import Readable
@@ -59,7 +61,7 @@ class City(BaseModel):
 class User(BaseModel, tablename="base_user"):
     first_name = Varchar(length=50)
     last_name = Varchar(length=50)
-    username = Varchar(length=200)
+    username = Varchar(length=200, index=True)
     email = Email(length=500, unique=True)
     password = Secret(length=255)
     avatar = ForeignKey(references=File, on_delete=OnDelete.set_null, null=True)
@@ -78,6 +80,8 @@ class User(BaseModel, tablename="base_user"):
     # Tokens
     access_token = Varchar(1000, null=True)
     refresh_token = Varchar(1000, null=True)
+    # Bumped to revoke issued access tokens (login, refresh, logout)
+    token_version = Integer(default=0)
 
     # Profile Fields
     bio = Varchar(length=200, null=True)
@@ -142,7 +146,7 @@ class User(BaseModel, tablename="base_user"):
 
         cls._validate_password(password=password)
 
-        password = cls.hash_password(password)
+        password = await cls.hash_password_async(password)
         await cls.update({cls.password: password}).where(clause).run()
 
     ###########################################################################
@@ -163,6 +167,17 @@ class User(BaseModel, tablename="base_user"):
         hashed = cls._ph.hash(password)
         return hashed
 
+    @classmethod
+    async def hash_password_async(cls, password: str) -> str:
+        """
+        Like :meth:`hash_password`, but hashes in the password hasher pool so
+        that the event loop isn't blocked.
+        """
+        if len(password) > cls._max_password_length:
+            logger.warning("Excessively long password provided.")
+            raise ValueError("The password is too long.")
+        return await password_hasher.hash_password(password)
+
     ###########################################################################
 
     @classmethod
@@ -194,12 +209,12 @@ class User(BaseModel, tablename="base_user"):
         if not user:
             return None
 
-        password_check = cls.check_password(password, user.password)
+        password_check = await cls.verify_password_async(password, user.password)
         if not password_check:
             return None
 
         user.last_login = datetime.now()
-        await user.save()
+        await user.save([cls.last_login])
         return user
 
     ###########################################################################
@@ -212,6 +227,13 @@ class User(BaseModel, tablename="base_user"):
             return None
         return True
 
+    @classmethod
+    async def verify_password_async(cls, entered_password, user_password):
+        """
+        Like :meth:`check_password`, but verifies in the password hasher pool.
+        """
+        return await password_hasher.verify_password(user_password, entered_password)
+
     @classmethod
     async def create_user(cls, email: str, password: str, **extra_params):
         """
@@ -229,7 +251,7 @@ class User(BaseModel, tablename="base_user"):
             raise ValueError("An email must be provided.")
 
         cls._validate_password(password=password)
-        password = cls.hash_password(password)
+        password = await cls.hash_password_async(password)
         user = cls(email=email, password=password, **extra_params)
         await user.save()
         return user
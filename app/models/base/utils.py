@@ -0,0 +1,31 @@
+import typing as t
+
+
+class QueryWithUpdates(object):
+    # Wraps a save/remove query so that related updates (e.g denormalised counters)
+    # run right after it, in the same transaction. Awaitable and runnable like the
+    # wrapped query, so it can be returned from Table.save and Table.remove.
+    # Updates with an after_commit method (e.g buffered counters) are only applied once
+    # the transaction commits. Inside a transaction opened elsewhere, whose commit isn't
+    # seen here, they run as regular updates instead.
+    def __init__(self, query, *updates) -> None:
+        self.query = query
+        self.updates = updates
+
+    async def run(self, node: t.Optional[str] = None, in_pool: bool = True):
+        engine = self.query.table._meta.db
+        nested = engine.current_transaction.get() is not None
+        deferred = []
+        async with engine.transaction():  # Joins the current transaction if any
+            response = await self.query.run(node=node, in_pool=in_pool)
+            for update in self.updates:
+                if not nested and hasattr(update, "after_commit"):
+                    deferred.append(update)
+                else:
+                    await update.run(node=node, in_pool=in_pool)
+        for update in deferred:
+            update.after_commit()
+        return response
+
+    def __await__(self):
+        return self.run().__await__()
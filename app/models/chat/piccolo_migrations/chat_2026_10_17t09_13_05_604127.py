@@ -0,0 +1,32 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class Message(Table, tablename="message", schema=None):
+    pass
+
+
+ID = "2026-10-17T09:13:05:604127"
+VERSION = "1.2.0"
+DESCRIPTION = "Keyset pagination indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="chat", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite indexes, so raw sql is used here.
+    # The index matches the (chat, created_at, id) seek used for cursor pagination.
+    async def run():
+        await Message.raw(
+            "CREATE INDEX IF NOT EXISTS message_chat_created_at_id ON message (chat, created_at, id)"
+        )
+
+    async def run_backwards():
+        await Message.raw("DROP INDEX IF EXISTS message_chat_created_at_id")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
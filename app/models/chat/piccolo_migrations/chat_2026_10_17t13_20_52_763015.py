@@ -0,0 +1,32 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class Chat(Table, tablename="chat", schema=None):
+    pass
+
+
+ID = "2026-10-17T13:20:52:763015"
+VERSION = "1.2.0"
+DESCRIPTION = "Route query indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="chat", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite indexes, so raw sql is used here.
+    # Chats are looked up by owner (and type). Members are indexed with the chat_member table.
+    async def run():
+        await Chat.raw(
+            "CREATE INDEX IF NOT EXISTS chat_owner_ctype ON chat (owner, ctype)"
+        )
+
+    async def run_backwards():
+        await Chat.raw("DROP INDEX IF EXISTS chat_owner_ctype")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
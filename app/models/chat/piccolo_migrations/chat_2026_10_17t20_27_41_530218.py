@@ -0,0 +1,37 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class ChatMember(Table, tablename="chat_member", schema=None):
+    pass
+
+
+ID = "2026-10-17T20:27:41:530218"
+VERSION = "1.2.0"
+DESCRIPTION = "Chat members indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="chat", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite indexes, so raw sql is used here.
+    # (chat, user) is unique and serves the members of a chat, (user, chat) the chats
+    # of a user.
+    async def run():
+        await ChatMember.raw(
+            'CREATE UNIQUE INDEX IF NOT EXISTS chat_member_chat_user ON chat_member (chat, "user")'
+        )
+        await ChatMember.raw(
+            'CREATE INDEX IF NOT EXISTS chat_member_user_chat ON chat_member ("user", chat)'
+        )
+
+    async def run_backwards():
+        await ChatMember.raw("DROP INDEX IF EXISTS chat_member_chat_user")
+        await ChatMember.raw("DROP INDEX IF EXISTS chat_member_user_chat")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
@@ -0,0 +1,42 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class ChatMember(Table, tablename="chat_member", schema=None):
+    pass
+
+
+ID = "2026-10-17T20:27:58:271944"
+VERSION = "1.2.0"
+DESCRIPTION = "Chat members backfill"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="chat", description=DESCRIPTION
+    )
+
+    # Members are copied from the chats' owner and user_ids
+    async def run():
+        await ChatMember.raw(
+            'INSERT INTO chat_member (id, created_at, updated_at, chat, "user") '
+            "SELECT uuid_generate_v4(), now(), now(), members.chat, members.user_id "
+            "FROM (SELECT id AS chat, owner AS user_id FROM chat "
+            "UNION SELECT id, unnest(user_ids) FROM chat) AS members "
+            "JOIN base_user ON base_user.id = members.user_id "
+            'ON CONFLICT (chat, "user") DO NOTHING'
+        )
+
+    # And back to user_ids, once the column is restored
+    async def run_backwards():
+        await ChatMember.raw(
+            "UPDATE chat SET user_ids = COALESCE(("
+            'SELECT array_agg(chat_member."user") FROM chat_member '
+            'WHERE chat_member.chat = chat.id AND chat_member."user" != chat.owner'
+            "), ARRAY[]::uuid[])"
+        )
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
@@ -0,0 +1,22 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+
+
+ID = "2026-10-17T20:28:15:904611"
+VERSION = "1.2.0"
+DESCRIPTION = "Drop Chat.user_ids (replaced by chat members)"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="chat", description=DESCRIPTION
+    )
+
+    manager.drop_column(
+        table_class_name="Chat",
+        tablename="chat",
+        column_name="user_ids",
+        db_column_name="user_ids",
+        schema=None,
+    )
+
+    return manager
@@ -3,7 +3,9 @@ from app.api.schemas.base import UserDataSchema
 from app.api.utils.file_processors import FileProcessor
 from app.models.accounts.tables import User
 from app.models.base.tables import BaseModel, File
-from piccolo.columns import Varchar, ForeignKey, OnDelete, Array, UUID, Text
+from app.models.base.utils import QueryWithUpdates
+from piccolo.columns import Varchar, ForeignKey, OnDelete, UUID, Text
+from piccolo.columns.combination import WhereRaw
 
 
 class ChatChoices(Enum):
@@ -15,9 +17,6 @@ class Chat(BaseModel):
     name = Varchar(length=100, null=True)
     owner = ForeignKey(references=User, on_delete=OnDelete.cascade)
     ctype = Varchar(10, default="DM", choices=ChatChoices)
-    user_ids = Array(
-        base_column=UUID(default=None)
-    )  # IDs of users that are part of the chat
     description = Varchar(length=1000, null=True)
     image = ForeignKey(references=File, on_delete=OnDelete.set_null, null=True)
     latest_message_id = UUID(default=None, null=True)
@@ -26,6 +25,41 @@ class Chat(BaseModel):
     def __str__(self):
         return str(self.id)
 
+    @classmethod
+    def member_filter(cls, user_id) -> WhereRaw:
+        # Chats the user is a member of (an index seek on chat_member)
+        return WhereRaw(
+            'EXISTS (SELECT 1 FROM chat_member WHERE chat_member.chat = "chat"."id" '
+            'AND chat_member."user" = {})',
+            user_id,
+        )
+
+    @classmethod
+    def dm_filters(cls, user_id, recipient_id) -> list:
+        # The DM between both users
+        filters = [
+            cls.ctype == "DM",
+            cls.member_filter(user_id),
+            cls.member_filter(recipient_id),
+        ]
+        if user_id == recipient_id:  # A DM with oneself has no other member
+            filters.append(
+                WhereRaw(
+                    "NOT EXISTS (SELECT 1 FROM chat_member "
+                    'WHERE chat_member.chat = "chat"."id" AND chat_member."user" != {})',
+                    user_id,
+                )
+            )
+        return filters
+
+    @classmethod
+    async def create_with_members(cls, owner: User, user_ids: list, **data) -> "Chat":
+        # user_ids are the members other than the owner
+        async with cls._meta.db.transaction():
+            chat = await cls.objects().create(owner=owner, **data)
+            await ChatMember.add(chat.id, list(dict.fromkeys([owner.id, *user_ids])))
+        return chat
+
     @property
     def get_image(self):
         image = self.image
@@ -57,6 +91,26 @@ class Chat(BaseModel):
     # I'll surely update this when they've updated the orm
 
 
+class ChatMember(BaseModel):
+    # The users of a chat, the owner included (unique per chat and user)
+    chat = ForeignKey(references=Chat, on_delete=OnDelete.cascade)
+    user = ForeignKey(references=User, on_delete=OnDelete.cascade)
+
+    @classmethod
+    async def add(cls, chat_id, user_ids: list):
+        if user_ids:
+            await cls.insert(*[cls(chat=chat_id, user=user_id) for user_id in user_ids])
+
+    @classmethod
+    async def remove_users(cls, chat_id, user_ids: list):
+        if user_ids:
+            await cls.delete().where(cls.chat == chat_id, cls.user.is_in(user_ids))
+
+    @classmethod
+    async def is_member(cls, chat_id, user_id) -> bool:
+        return await cls.exists().where(cls.chat == chat_id, cls.user == user_id)
+
+
 class Message(BaseModel):
     chat = ForeignKey(references=Chat, on_delete=OnDelete.cascade)
     sender = ForeignKey(references=User, on_delete=OnDelete.cascade)
@@ -64,12 +118,16 @@ class Message(BaseModel):
     file = ForeignKey(references=File, on_delete=OnDelete.set_null, null=True)
 
     def save(self, *args, **kwargs):
+        query = super().save(*args, **kwargs)
         if not self._exists_in_db:
             # Update the chat latest message ID
-            Chat.update({Chat.latest_message_id: self.id}).where(
-                Chat.id == self.chat
-            ).run_sync()
-        return super().save(*args, **kwargs)
+            query = QueryWithUpdates(
+                query,
+                Chat.update({Chat.latest_message_id: self.id}).where(
+                    Chat.id == self.chat
+                ),
+            )
+        return query
 
     @property
     def get_file(self):
@@ -0,0 +1,62 @@
+from app.models.feed.tables import Comment, Post, Reply
+
+# Recomputes the denormalised counters, only touching the rows that drifted
+RECONCILE_QUERIES = (
+    (
+        Post,
+        """
+        UPDATE "post" SET "reactions_count" = c.reactions, "comments_count" = c.comments
+        FROM (
+            SELECT p.id,
+                (SELECT count(*) FROM "reaction" r WHERE r.post = p.id) AS reactions,
+                (SELECT count(*) FROM "comment" c WHERE c.post = p.id) AS comments
+            FROM "post" p
+        ) c
+        WHERE "post"."id" = c.id
+        AND ("post"."reactions_count", "post"."comments_count") IS DISTINCT FROM (c.reactions, c.comments)
+        RETURNING "post"."id"
+        """,
+    ),
+    (
+        Comment,
+        """
+        UPDATE "comment" SET "reactions_count" = c.reactions, "replies_count" = c.replies
+        FROM (
+            SELECT cm.id,
+                (SELECT count(*) FROM "reaction" r WHERE r.comment = cm.id) AS reactions,
+                (SELECT count(*) FROM "reply" rp WHERE rp.comment = cm.id) AS replies
+            FROM "comment" cm
+        ) c
+        WHERE "comment"."id" = c.id
+        AND ("comment"."reactions_count", "comment"."replies_count") IS DISTINCT FROM (c.reactions, c.replies)
+        RETURNING "comment"."id"
+        """,
+    ),
+    (
+        Reply,
+        """
+        UPDATE "reply" SET "reactions_count" = c.reactions
+        FROM (
+            SELECT rp.id, (SELECT count(*) FROM "reaction" r WHERE r.reply = rp.id) AS reactions
+            FROM "reply" rp
+        ) c
+        WHERE "reply"."id" = c.id AND "reply"."reactions_count" IS DISTINCT FROM c.reactions
+        RETURNING "reply"."id"
+        """,
+    ),
+)
+
+
+async def reconcile_counts():
+    """
+    Recompute reactions, comments and replies counts from the Reaction, Comment
+    and Reply tables, to repair any drift.
+
+    With the counter buffer enabled, this races with the deltas the running app hasn't
+    flushed yet: rows recomputed here get them added again on the next flush. Run it
+    with the buffer disabled or the app stopped, or run it again once the buffers
+    have been flushed.
+    """
+    for model, query in RECONCILE_QUERIES:
+        response = await model.raw(query)
+        print(f"{model._meta.tablename}: {len(response)} row(s) repaired")
@@ -1,7 +1,8 @@
 import os
 
-from piccolo.conf.apps import AppConfig
+from piccolo.conf.apps import AppConfig, Command
 
+from .commands.reconcile_counts import reconcile_counts
 from .tables import Comment, Post, Reaction, Reply
 
 CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
@@ -11,4 +12,5 @@ APP_CONFIG = AppConfig(
     app_name="feed",
     migrations_folder_path=os.path.join(CURRENT_DIRECTORY, "piccolo_migrations"),
     table_classes=[Post, Comment, Reply, Reaction],
+    commands=[Command(callable=reconcile_counts, aliases=["reconcile"])],
 )
@@ -0,0 +1,40 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class Post(Table, tablename="post", schema=None):
+    pass
+
+
+ID = "2026-10-17T09:12:40:218411"
+VERSION = "1.2.0"
+DESCRIPTION = "Keyset pagination indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="feed", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite indexes, so raw sql is used here.
+    # The indexes match the (filter, created_at, id) seek used for cursor pagination.
+    async def run():
+        await Post.raw(
+            "CREATE INDEX IF NOT EXISTS post_created_at_id ON post (created_at, id)"
+        )
+        await Post.raw(
+            "CREATE INDEX IF NOT EXISTS comment_post_created_at_id ON comment (post, created_at, id)"
+        )
+        await Post.raw(
+            "CREATE INDEX IF NOT EXISTS reply_comment_created_at_id ON reply (comment, created_at, id)"
+        )
+
+    async def run_backwards():
+        await Post.raw("DROP INDEX IF EXISTS post_created_at_id")
+        await Post.raw("DROP INDEX IF EXISTS comment_post_created_at_id")
+        await Post.raw("DROP INDEX IF EXISTS reply_comment_created_at_id")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
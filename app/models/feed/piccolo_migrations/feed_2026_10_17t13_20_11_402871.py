@@ -0,0 +1,45 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class Reaction(Table, tablename="reaction", schema=None):
+    pass
+
+
+ID = "2026-10-17T13:20:11:402871"
+VERSION = "1.2.0"
+DESCRIPTION = "Route query indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="feed", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite or GIN indexes, so raw sql is used here.
+    # Reactions are listed by their post/comment/reply (and optionally rtype), and
+    # looked up by user when toggled.
+    async def run():
+        await Reaction.raw(
+            "CREATE INDEX IF NOT EXISTS reaction_post_rtype ON reaction (post, rtype)"
+        )
+        await Reaction.raw(
+            "CREATE INDEX IF NOT EXISTS reaction_comment_rtype ON reaction (comment, rtype)"
+        )
+        await Reaction.raw(
+            "CREATE INDEX IF NOT EXISTS reaction_reply_rtype ON reaction (reply, rtype)"
+        )
+        await Reaction.raw(
+            'CREATE INDEX IF NOT EXISTS reaction_user ON reaction ("user")'
+        )
+
+    async def run_backwards():
+        await Reaction.raw("DROP INDEX IF EXISTS reaction_post_rtype")
+        await Reaction.raw("DROP INDEX IF EXISTS reaction_comment_rtype")
+        await Reaction.raw("DROP INDEX IF EXISTS reaction_reply_rtype")
+        await Reaction.raw("DROP INDEX IF EXISTS reaction_user")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
@@ -5,6 +5,7 @@ from slugify import slugify
 from app.api.utils.file_processors import FileProcessor
 from app.models.accounts.tables import User
 from app.models.base.tables import BaseModel, File
+from app.models.base.utils import QueryWithUpdates
 from app.models.feed.utils import update_count
 
 
@@ -58,38 +59,48 @@ class Comment(FeedAbstract):
     )  # Doing this because inverse foreignkey isn't available in this orm yet.
 
     def save(self, *args, **kwargs):
+        query = super().save(*args, **kwargs)
         if not self._exists_in_db:
             # Update comments count for post when created
             post = self.post
             post_id = post if isinstance(post, UUID) else post.id
-            update_count(Post, post_id, "comments_count")
-        return super().save(*args, **kwargs)
+            query = QueryWithUpdates(
+                query, update_count(Post, post_id, "comments_count")
+            )
+        return query
 
     def remove(self, *args, **kwargs):
         # Update comments count for post when deleted
         post = self.post
         post_id = post if isinstance(post, UUID) else post.id
-        update_count(Post, post_id, "comments_count", "remove")
-        return super().remove(*args, **kwargs)
+        return QueryWithUpdates(
+            super().remove(*args, **kwargs),
+            update_count(Post, post_id, "comments_count", "remove"),
+        )
 
 
 class Reply(FeedAbstract):
     comment = ForeignKey(Comment, on_delete=OnDelete.cascade)
 
     def save(self, *args, **kwargs):
+        query = super().save(*args, **kwargs)
         if not self._exists_in_db:
             # Update replies count for comment when created
             comment = self.comment
             comment_id = comment if isinstance(comment, UUID) else comment.id
-            update_count(Comment, comment_id, "replies_count")
-        return super().save(*args, **kwargs)
+            query = QueryWithUpdates(
+                query, update_count(Comment, comment_id, "replies_count")
+            )
+        return query
 
     def remove(self, *args, **kwargs):
         # Update replies count for comment when removed
         comment = self.comment
         comment_id = comment if isinstance(comment, UUID) else comment.id
-        update_count(Comment, comment_id, "replies_count", "remove")
-        return super().remove(*args, **kwargs)
+        return QueryWithUpdates(
+            super().remove(*args, **kwargs),
+            update_count(Comment, comment_id, "replies_count", "remove"),
+        )
 
 
 class Reaction(BaseModel):
@@ -127,13 +138,14 @@ class Reaction(BaseModel):
         model: Post | Comment | Reply = (
             self._targeted_obj_class
         )  # e.g Post, Comment, Reply
+        query = super().save(*args, **kwargs)
         if not self._exists_in_db:
             targeted_obj_id = (
                 targeted_obj if isinstance(targeted_obj, UUID) else targeted_obj.id
             )
             # If creation, update reactions count
-            update_count(model, targeted_obj_id)
-        return super().save(*args, **kwargs)
+            query = QueryWithUpdates(query, update_count(model, targeted_obj_id))
+        return query
 
     def remove(self, *args, **kwargs):
         targeted_obj = (
@@ -146,6 +158,7 @@ class Reaction(BaseModel):
             targeted_obj if isinstance(targeted_obj, UUID) else targeted_obj.id
         )
         # If removal, update reactions count
-        update_count(model, targeted_obj_id, action="remove")
-
-        return super().remove(*args, **kwargs)
+        return QueryWithUpdates(
+            super().remove(*args, **kwargs),
+            update_count(model, targeted_obj_id, action="remove"),
+        )
@@ -1,5 +1,111 @@
+import asyncio
+import logging
+import typing as t
+from collections import defaultdict
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer(object):
+    # Write-behind buffer for denormalised counters. Deltas are coalesced per
+    # (table, field, id) and flushed in batched updates every flush_interval seconds,
+    # or sooner once max_deltas are pending, so hot rows (e.g a viral post) get one
+    # update per flush instead of one per reaction.
+    def __init__(self, flush_interval: float = 0.5, max_deltas: int = 1000) -> None:
+        self.flush_interval = flush_interval
+        self.max_deltas = max_deltas
+        self._deltas = defaultdict(int)  # (table, field, id) -> delta
+        self._pending = 0
+        self._task: asyncio.Task = None
+        self._flushing: asyncio.Task = None
+
+    def add(self, model, targeted_obj_id, field: str, delta: int):
+        self._deltas[(model, field, targeted_obj_id)] += delta
+        self._pending += 1
+        flushing = self._flushing and not self._flushing.done()
+        if self._pending >= self.max_deltas and not flushing:
+            self._flushing = asyncio.create_task(self._safe_flush())
+
+    async def flush(self):
+        deltas, self._deltas, self._pending = self._deltas, defaultdict(int), 0
+        groups = defaultdict(list)
+        for (model, field, targeted_obj_id), delta in deltas.items():
+            if delta:
+                groups[(model, field)].append((targeted_obj_id, delta))
+
+        for (model, field), values in list(groups.items()):
+            tablename = model._meta.tablename
+            placeholders = ", ".join("({}::uuid, {}::bigint)" for _ in values)
+            try:
+                await model.raw(
+                    f'UPDATE "{tablename}" SET "{field}" = "{tablename}"."{field}" + v.delta '
+                    f"FROM (VALUES {placeholders}) AS v(id, delta) "
+                    f'WHERE "{tablename}"."id" = v.id',
+                    *[value for row in values for value in row],
+                )
+            except Exception:
+                # Keep the deltas that weren't written for the next flush
+                for (model, field), values in groups.items():
+                    for targeted_obj_id, delta in values:
+                        self._deltas[(model, field, targeted_obj_id)] += delta
+                        self._pending += 1
+                raise
+            del groups[(model, field)]
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Couldn't flush counters")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._flushing:
+            await self._flushing
+        # Whatever is left, a failure mustn't stop the rest of the shutdown
+        await self._safe_flush()
+
+
+counter_buffer = CounterBuffer(
+    flush_interval=settings.COUNTER_BUFFER_FLUSH_INTERVAL_MS / 1000,
+    max_deltas=settings.COUNTER_BUFFER_MAX_DELTAS,
+)
+
+
+class BufferedCount(object):
+    # Adds the delta to the counter buffer once the save/remove transaction commits
+    # (see QueryWithUpdates), so rolled back changes leave no delta behind
+    def __init__(self, model, targeted_obj_id, field: str, delta: int) -> None:
+        self.args = (model, targeted_obj_id, field, delta)
+
+    def after_commit(self):
+        counter_buffer.add(*self.args)
+
+    async def run(self, node: t.Optional[str] = None, in_pool: bool = True):
+        # In a transaction that commits elsewhere, update the counter right away instead
+        model, targeted_obj_id, field, delta = self.args
+        column = getattr(model, field)
+        await model.update({column: column + delta}).where(model.id == targeted_obj_id)
+
+
 def update_count(model, targeted_obj_id, field="reactions_count", action="add"):
-    value = getattr(model, field) + 1 if action == "add" else getattr(model, field) - 1
-    model.update({getattr(model, field): value}).where(
-        model.id == targeted_obj_id
-    ).run_sync()
+    if settings.COUNTER_BUFFER_ENABLED:
+        delta = 1 if action == "add" else -1
+        return BufferedCount(model, targeted_obj_id, field, delta)
+    # An atomic increment/decrement (e.g SET reactions_count = reactions_count + 1)
+    column = getattr(model, field)
+    value = column + 1 if action == "add" else column - 1
+    return model.update({column: value}).where(model.id == targeted_obj_id)
@@ -5,6 +5,7 @@ from piccolo.conf.apps import AppConfig
 from .tables import (
     Friend,
     Notification,
+    NotificationRecipient,
 )
 
 CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
@@ -16,5 +17,6 @@ APP_CONFIG = AppConfig(
     table_classes=[
         Friend,
         Notification,
+        NotificationRecipient,
     ],
 )
@@ -0,0 +1,41 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class Notification(Table, tablename="notification", schema=None):
+    pass
+
+
+ID = "2026-10-17T13:20:34:118250"
+VERSION = "1.2.0"
+DESCRIPTION = "Route query indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="profiles", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite indexes, so raw sql is used here.
+    # Friendships are looked up from either side (by status), notifications by sender
+    # and type. Receivers are indexed with the notification_recipient table.
+    async def run():
+        await Notification.raw(
+            "CREATE INDEX IF NOT EXISTS friend_requester_requestee_status ON friend (requester, requestee, status)"
+        )
+        await Notification.raw(
+            "CREATE INDEX IF NOT EXISTS friend_requestee_status ON friend (requestee, status)"
+        )
+        await Notification.raw(
+            "CREATE INDEX IF NOT EXISTS notification_sender_ntype ON notification (sender, ntype)"
+        )
+
+    async def run_backwards():
+        await Notification.raw("DROP INDEX IF EXISTS friend_requester_requestee_status")
+        await Notification.raw("DROP INDEX IF EXISTS friend_requestee_status")
+        await Notification.raw("DROP INDEX IF EXISTS notification_sender_ntype")
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
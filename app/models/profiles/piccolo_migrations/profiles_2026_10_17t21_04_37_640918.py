@@ -0,0 +1,41 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class NotificationRecipient(Table, tablename="notification_recipient", schema=None):
+    pass
+
+
+ID = "2026-10-17T21:04:37:640918"
+VERSION = "1.2.0"
+DESCRIPTION = "Notification recipients indexes"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="profiles", description=DESCRIPTION
+    )
+
+    # Piccolo has no provision for composite indexes, so raw sql is used here.
+    # (user, read_at, created_at) serves a user's notifications and unread count,
+    # the unique (notification, user) the recipients of a notification.
+    async def run():
+        await NotificationRecipient.raw(
+            'CREATE INDEX IF NOT EXISTS notification_recipient_user_read_at_created_at ON notification_recipient ("user", read_at, created_at)'
+        )
+        await NotificationRecipient.raw(
+            'CREATE UNIQUE INDEX IF NOT EXISTS notification_recipient_notification_user ON notification_recipient (notification, "user")'
+        )
+
+    async def run_backwards():
+        await NotificationRecipient.raw(
+            "DROP INDEX IF EXISTS notification_recipient_user_read_at_created_at"
+        )
+        await NotificationRecipient.raw(
+            "DROP INDEX IF EXISTS notification_recipient_notification_user"
+        )
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
@@ -0,0 +1,51 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+
+class NotificationRecipient(Table, tablename="notification_recipient", schema=None):
+    pass
+
+
+ID = "2026-10-17T21:04:58:913264"
+VERSION = "1.2.0"
+DESCRIPTION = "Notification recipients backfill"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="profiles", description=DESCRIPTION
+    )
+
+    # Recipients are copied from the notifications' receiver_ids, those in read_by_ids
+    # as read (at the notification's last update, the closest known time)
+    async def run():
+        await NotificationRecipient.raw(
+            "INSERT INTO notification_recipient "
+            '(id, created_at, updated_at, "user", notification, read_at) '
+            "SELECT uuid_generate_v4(), notification.created_at, now(), "
+            "receivers.user_id, notification.id, CASE WHEN "
+            "receivers.user_id = ANY(notification.read_by_ids) "
+            "THEN notification.updated_at END "
+            "FROM notification CROSS JOIN LATERAL "
+            "unnest(notification.receiver_ids) AS receivers(user_id) "
+            "JOIN base_user ON base_user.id = receivers.user_id "
+            'ON CONFLICT (notification, "user") DO NOTHING'
+        )
+
+    # And back to receiver_ids and read_by_ids, once the columns are restored
+    async def run_backwards():
+        await NotificationRecipient.raw(
+            "UPDATE notification SET receiver_ids = COALESCE(("
+            'SELECT array_agg(notification_recipient."user") FROM notification_recipient '
+            "WHERE notification_recipient.notification = notification.id"
+            "), ARRAY[]::uuid[]), read_by_ids = COALESCE(("
+            'SELECT array_agg(notification_recipient."user") FROM notification_recipient '
+            "WHERE notification_recipient.notification = notification.id "
+            "AND notification_recipient.read_at IS NOT NULL"
+            "), ARRAY[]::uuid[])"
+        )
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
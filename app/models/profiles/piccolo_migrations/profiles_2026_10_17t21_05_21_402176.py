@@ -0,0 +1,30 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+
+
+ID = "2026-10-17T21:05:21:402176"
+VERSION = "1.2.0"
+DESCRIPTION = "Drop Notification.receiver_ids and read_by_ids (replaced by recipients)"
+
+
+async def forwards():
+    manager = MigrationManager(
+        migration_id=ID, app_name="profiles", description=DESCRIPTION
+    )
+
+    manager.drop_column(
+        table_class_name="Notification",
+        tablename="notification",
+        column_name="receiver_ids",
+        db_column_name="receiver_ids",
+        schema=None,
+    )
+
+    manager.drop_column(
+        table_class_name="Notification",
+        tablename="notification",
+        column_name="read_by_ids",
+        db_column_name="read_by_ids",
+        schema=None,
+    )
+
+    return manager
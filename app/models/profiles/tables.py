@@ -1,8 +1,10 @@
+from datetime import datetime, timezone
 from enum import Enum
 from app.api.utils.notification import get_notification_message
 from app.models.accounts.tables import User
 from app.models.base.tables import BaseModel
-from piccolo.columns import Varchar, ForeignKey, OnDelete, Array, UUID
+from piccolo.columns import Varchar, ForeignKey, OnDelete, Timestamptz
+from piccolo.columns.combination import WhereRaw
 
 from app.models.feed.tables import Comment, Post, Reply
 
@@ -38,21 +40,32 @@ class NotificationTypeChoices(Enum):
 
 class Notification(BaseModel):
     sender = ForeignKey(references=User, on_delete=OnDelete.cascade, null=True)
-    receiver_ids = Array(
-        base_column=UUID()
-    )  # IDs of users that has received the notification
     ntype = Varchar(100, choices=NotificationTypeChoices)
     post = ForeignKey(references=Post, on_delete=OnDelete.cascade, null=True)
     comment = ForeignKey(references=Comment, on_delete=OnDelete.cascade, null=True)
     reply = ForeignKey(references=Reply, on_delete=OnDelete.cascade, null=True)
     text = Varchar(100, null=True)
-    read_by_ids = Array(
-        base_column=UUID()
-    )  # IDs of users that has read the notification
 
     def __str__(self):
         return str(self.id)
 
+    @classmethod
+    def recipient_filter(cls, user_id) -> WhereRaw:
+        # Notifications received by the user (an index seek on notification_recipient)
+        return WhereRaw(
+            "EXISTS (SELECT 1 FROM notification_recipient "
+            'WHERE notification_recipient.notification = "notification"."id" '
+            'AND notification_recipient."user" = {})',
+            user_id,
+        )
+
+    @classmethod
+    async def create_with_recipients(cls, receiver_ids: list, **data) -> "Notification":
+        async with cls._meta.db.transaction():
+            notification = await cls.objects().create(**data)
+            await NotificationRecipient.add(notification.id, receiver_ids)
+        return notification
+
     @property
     def message(self):
         text = self.text
@@ -77,3 +90,56 @@ class Notification(BaseModel):
     # in your migration files which is something I don't want to do. So I'll just focus on
     # doing very good validations. But there will be no db level constraints
     # I'll surely update this when they've updated the orm
+
+
+class NotificationRecipient(BaseModel):
+    # A notification in a user's inbox (unique per notification and user), read_at is
+    # set once the user reads it
+    user = ForeignKey(references=User, on_delete=OnDelete.cascade)
+    notification = ForeignKey(references=Notification, on_delete=OnDelete.cascade)
+    read_at = Timestamptz(null=True, default=None)
+
+    @classmethod
+    async def add(cls, notification_id, user_ids: list):
+        user_ids = [getattr(user_id, "id", user_id) for user_id in user_ids]
+        if user_ids:
+            await cls.insert(
+                *[cls(notification=notification_id, user=id) for id in user_ids]
+            )
+
+    @classmethod
+    async def get_user_ids(cls, notification_id) -> list:
+        return (
+            await cls.select(cls.user)
+            .where(cls.notification == notification_id)
+            .output(as_list=True)
+        )
+
+    @classmethod
+    async def get_read_notification_ids(cls, user_id, notification_ids: list) -> set:
+        if not notification_ids:
+            return set()
+        read_ids = (
+            await cls.select(cls.notification)
+            .where(
+                cls.user == user_id,
+                cls.notification.is_in(notification_ids),
+                cls.read_at.is_not_null(),
+            )
+            .output(as_list=True)
+        )
+        return set(read_ids)
+
+    @classmethod
+    async def mark_as_read(cls, user_id, notification_id=None):
+        # One notification or, without an id, every unread one of the user
+        query = cls.update({cls.read_at: datetime.now(timezone.utc)}).where(
+            cls.user == user_id, cls.read_at.is_null()
+        )
+        if notification_id:
+            query = query.where(cls.notification == notification_id)
+        await query
+
+    @classmethod
+    async def count_unread(cls, user_id) -> int:
+        return await cls.count().where(cls.user == user_id, cls.read_at.is_null())
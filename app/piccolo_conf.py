@@ -1,16 +1,42 @@
-from piccolo.engine.postgres import PostgresEngine
 from piccolo.conf.apps import AppRegistry
 
 from app.core.config import settings
+from app.core.database import InstrumentedPostgresEngine
 
-DB = PostgresEngine(
-    config={
-        "host": settings.POSTGRES_SERVER,
-        "database": settings.POSTGRES_DB,
-        "user": settings.POSTGRES_USER,
-        "password": settings.POSTGRES_PASSWORD,
-        "port": settings.POSTGRES_PORT,
-    },
+DB_CONFIG = {
+    "host": settings.POSTGRES_SERVER,
+    "database": settings.POSTGRES_DB,
+    "user": settings.POSTGRES_USER,
+    "password": settings.POSTGRES_PASSWORD,
+    "port": settings.POSTGRES_PORT,
+    "statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE,
+}
+POOL_OPTIONS = {
+    "min_size": settings.POSTGRES_POOL_MIN_SIZE,
+    "max_size": settings.POSTGRES_POOL_MAX_SIZE,
+    "max_queries": settings.POSTGRES_POOL_MAX_QUERIES,
+    "max_inactive_connection_lifetime": settings.POSTGRES_POOL_MAX_INACTIVE_CONNECTION_LIFETIME,
+}
+
+REPLICA = None
+if settings.POSTGRES_REPLICA_SERVER:
+    REPLICA = InstrumentedPostgresEngine(
+        config={
+            **DB_CONFIG,
+            "host": settings.POSTGRES_REPLICA_SERVER,
+            "port": settings.POSTGRES_REPLICA_PORT or settings.POSTGRES_PORT,
+        },
+        pool_options=POOL_OPTIONS,
+        extensions=(),  # Read only
+        log_responses=settings.DEBUG,
+    )
+
+DB = InstrumentedPostgresEngine(
+    config=DB_CONFIG,
+    pool_options=POOL_OPTIONS,
+    replica=REPLICA,
+    max_replica_lag=settings.POSTGRES_REPLICA_MAX_LAG_SECONDS,
+    replica_lag_check_interval=settings.POSTGRES_REPLICA_LAG_CHECK_INTERVAL_SECONDS,
     log_responses=settings.DEBUG,
 )
 
@@ -0,0 +1,150 @@
+"""
+Compares the CPU spent serializing the responses of GET /feed/posts and GET /chats/{id}
+(50 and 400 items) through:
+    * fastapi: FastAPI's response validation/serialization + JSONResponse (json.dumps)
+    * orjson: FastAPI's response validation/serialization + ORJSONResponse
+    * schema_response: one validation with the json written by pydantic-core (what the routes use)
+
+Rows with files include the avatar/image/file url generation, which is the same for all paths.
+
+Run with the app's environment variables set: python -m benchmarks.serialization
+"""
+
+import asyncio
+import itertools
+import time
+import uuid
+from datetime import datetime
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.schemas.chat import ChatResponseSchema
+from app.api.schemas.feed import PostsResponseSchema
+from app.api.utils.responses import schema_response
+from app.models.accounts.tables import User
+from app.models.base.tables import File
+from app.models.chat.tables import Chat, Message
+from app.models.feed.tables import Post
+
+ITERATIONS = 50
+
+
+def make_file(with_files: bool, resource_type: str = "image/png"):
+    return File(id=uuid.uuid4(), resource_type=resource_type) if with_files else None
+
+
+def make_user(index: int, with_files: bool) -> User:
+    avatar = make_file(with_files)
+    return User(
+        id=uuid.uuid4(),
+        first_name="Test",
+        last_name=f"User{index}",
+        username=f"test-user-{index}",
+        avatar=avatar,
+    )
+
+
+def posts_content(size: int, with_files: bool) -> dict:
+    now = datetime.now()
+    posts = []
+    for index in range(size):
+        post = Post(
+            id=uuid.uuid4(),
+            author=make_user(index, with_files),
+            text="Some post text " * 10,
+            slug=f"test-user-{index}-{uuid.uuid4()}",
+            image=make_file(with_files, "image/jpeg"),
+            created_at=now,
+            updated_at=now,
+        )
+        posts.append(post)
+    data = {
+        "items": posts,
+        "per_page": size,
+        "current_page": 1,
+        "last_page": 10,
+        "last_page_estimated": False,
+        "next_cursor": "cursor",
+        "prev_cursor": None,
+    }
+    return {"message": "Posts fetched", "data": data}
+
+
+def messages_content(size: int, with_files: bool) -> dict:
+    now = datetime.now()
+    users = [make_user(index, with_files) for index in range(10)]
+    chat = Chat(
+        id=uuid.uuid4(), owner=users[0], ctype="GROUP", created_at=now, updated_at=now
+    )
+    messages = []
+    for index in range(size):
+        message = Message(
+            id=uuid.uuid4(),
+            chat=chat.id,
+            sender=users[index % len(users)],
+            text="Some message text",
+            file=make_file(with_files),
+            created_at=now,
+            updated_at=now,
+        )
+        messages.append(message)
+    chat._latest_message_obj = messages[0]
+    data = {
+        "items": messages,
+        "per_page": size,
+        "current_page": None,
+        "last_page": None,
+        "next_cursor": "cursor",
+        "prev_cursor": None,
+    }
+    content = {"chat": chat, "messages": data, "users": users}
+    return {"message": "Messages fetched", "data": content}
+
+
+async def fastapi_path(field, content, response_class):
+    # What FastAPI does with the content returned by an endpoint
+    value = await serialize_response(field=field, response_content=content)
+    return response_class(value).body
+
+
+async def measure(func) -> float:
+    await func()  # Warm up
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        await func()
+    return (time.process_time() - start) / ITERATIONS * 1000
+
+
+async def main():
+    cases = [
+        ("/feed/posts", PostsResponseSchema, posts_content),
+        ("/chats/{id}", ChatResponseSchema, messages_content),
+    ]
+    print(
+        f"{'endpoint':<14}{'items':>6}{'files':>7}"
+        f"{'fastapi':>12}{'orjson':>12}{'schema_response':>18}"
+    )
+    for endpoint, schema, make_content in cases:
+        field = create_response_field(name="response", type_=schema)
+        for size, with_files in itertools.product((50, 400), (False, True)):
+            content = make_content(size, with_files)
+
+            async def fast_path():
+                return schema_response(schema, content).body
+
+            results = [
+                await measure(lambda: fastapi_path(field, content, JSONResponse)),
+                await measure(lambda: fastapi_path(field, content, ORJSONResponse)),
+                await measure(fast_path),
+            ]
+            print(
+                f"{endpoint:<14}{size:>6}{'yes' if with_files else 'no':>7}"
+                + "".join(f"{result:>10.2f}ms" for result in results[:2])
+                + f"{results[2]:>16.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())